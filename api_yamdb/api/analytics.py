@@ -0,0 +1,175 @@
+import math
+import threading
+from array import array
+from itertools import islice
+
+import numpy
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from reviews.models import Category, Genre, Review, Title
+
+MAX_SCORE = 10
+
+# number of histogram buckets, scores go from 0 to MAX_SCORE
+BUCKETS = MAX_SCORE + 1
+
+CACHE_KEY = 'analytics:catalog'
+
+
+def load_scores(chunk_size):
+    """
+    Return title ids and scores of all reviews as typed arrays, read
+    in chunks from a server-side cursor instead of model instances.
+    """
+    title_ids, scores = array('i'), array('b')
+    rows = Review.objects.order_by().values_list(
+        'title_id', 'score'
+    ).iterator(chunk_size)
+    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+        chunk_title_ids, chunk_scores = zip(*chunk)
+        title_ids.extend(chunk_title_ids)
+        scores.extend(chunk_scores)
+    return title_ids, scores
+
+
+def count_histograms(title_pks, title_ids, scores, groups):
+    """
+    Count scores of every group with NumPy. Reviews are grouped by
+    title first, groups are (title index, group index) pairs, so a title
+    of several genres adds its histogram to every one of them.
+    """
+    title_pks = numpy.array(title_pks, dtype=numpy.intc)
+    title_ids = numpy.asarray(title_ids)
+    scores = numpy.asarray(scores)
+    index = numpy.searchsorted(title_pks, title_ids)
+    # reviews of titles created or deleted while reading are left out
+    found = index < len(title_pks)
+    found[found] = title_pks[index[found]] == title_ids[found]
+    per_title = numpy.bincount(
+        index[found] * BUCKETS + scores[found],
+        minlength=len(title_pks) * BUCKETS
+    ).reshape(len(title_pks), BUCKETS)
+    histograms = []
+    for pairs, size in groups:
+        pairs = numpy.array(pairs, dtype=numpy.intp).reshape(-1, 2)
+        grouped = numpy.zeros((size, BUCKETS), dtype=numpy.int64)
+        numpy.add.at(grouped, pairs[:, 1], per_title[pairs[:, 0]])
+        histograms.append(grouped.tolist())
+    return histograms
+
+
+def summarize(histogram):
+    """
+    Return number of scores, their mean, percentiles and histogram.
+    Percentiles are scores of the nearest rank, like
+    numpy.percentile(..., method='inverted_cdf').
+    """
+    count = sum(histogram)
+    total = sum(score * number for score, number in enumerate(histogram))
+    percentiles = []
+    for percentile in settings.ANALYTICS_PERCENTILES:
+        rank = max(math.ceil(count * percentile / 100), 1)
+        seen = 0
+        for score, number in enumerate(histogram):
+            seen += number
+            if seen >= rank:
+                percentiles.append(score)
+                break
+    return {
+        'count': count,
+        'mean': round(total / count, 2),
+        'percentiles': percentiles,
+        'histogram': histogram,
+    }
+
+
+def build_analytics():
+    """
+    Return score distributions of reviews by genre, category and year
+    of their titles. Scores are loaded once into arrays and counted per
+    group in memory, not aggregated per title by the database.
+    """
+    title_ids, scores = load_scores(settings.ANALYTICS_CHUNK_SIZE)
+    titles = list(Title.objects.order_by('pk').values_list(
+        'pk', 'category_id', 'year'
+    ))
+    title_index = {pk: position for position, (pk, _, _) in enumerate(titles)}
+    genres = list(Genre.objects.order_by('slug').values_list(
+        'pk', 'slug', 'name'
+    ))
+    categories = list(Category.objects.order_by('slug').values_list(
+        'pk', 'slug', 'name'
+    ))
+    years = sorted({year for _, _, year in titles})
+    genre_index = {pk: position for position, (pk, _, _) in enumerate(genres)}
+    category_index = {
+        pk: position for position, (pk, _, _) in enumerate(categories)
+    }
+    year_index = {year: position for position, year in enumerate(years)}
+    groups = [
+        ([
+            (title_index[title_id], genre_index[genre_id])
+            for title_id, genre_id in Title.genre.through.objects.values_list(
+                'title_id', 'genre_id'
+            ).iterator()
+            if title_id in title_index and genre_id in genre_index
+        ], len(genres)),
+        ([
+            (position, category_index[category_id])
+            for position, (_, category_id, _) in enumerate(titles)
+            if category_id in category_index
+        ], len(categories)),
+        ([
+            (position, year_index[year])
+            for position, (_, _, year) in enumerate(titles)
+        ], len(years)),
+    ]
+    by_genre, by_category, by_year = count_histograms(
+        [pk for pk, _, _ in titles], title_ids, scores, groups
+    )
+    return {
+        'refreshed_at': timezone.now(),
+        'reviews': len(scores),
+        'percentiles': list(settings.ANALYTICS_PERCENTILES),
+        'genres': [
+            {'slug': slug, 'name': name, **summarize(histogram)}
+            for (_, slug, name), histogram in zip(genres, by_genre)
+            if any(histogram)
+        ],
+        'categories': [
+            {'slug': slug, 'name': name, **summarize(histogram)}
+            for (_, slug, name), histogram in zip(categories, by_category)
+            if any(histogram)
+        ],
+        'years': [
+            {'year': year, **summarize(histogram)}
+            for year, histogram in zip(years, by_year)
+            if any(histogram)
+        ],
+    }
+
+
+class CatalogAnalytics:
+    """
+    Score distributions shared through the cache and rebuilt when they
+    expire, at most once at a time in every process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def get(self):
+        analytics = cache.get(CACHE_KEY)
+        if analytics is None:
+            with self.lock:
+                analytics = cache.get(CACHE_KEY)
+                if analytics is None:
+                    analytics = build_analytics()
+                    cache.set(CACHE_KEY, analytics,
+                              settings.ANALYTICS_REFRESH_INTERVAL)
+        return analytics
+
+
+catalog_analytics = CatalogAnalytics()
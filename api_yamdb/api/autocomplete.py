@@ -0,0 +1,265 @@
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+from reviews.models import Category, Genre, Title
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    """
+    Sorted array of casefolded name words for prefix lookups.
+    Every word of a name is a key, so "туда" completes "Поворот туда".
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.keys = []
+        self.items = {}
+        # sizes of keys and items, containers are measured in stats()
+        self.memory = 0
+        self.truncated = False
+
+    @staticmethod
+    def _keys_for(item_id, name):
+        words = name.casefold().split()
+        return {(' '.join(words[i:]), item_id) for i in range(len(words))}
+
+    @staticmethod
+    def _key_size(key):
+        return sys.getsizeof(key) + sys.getsizeof(key[0])
+
+    @staticmethod
+    def _item_size(item):
+        name, payload = item
+        return (
+            sys.getsizeof(item) + sys.getsizeof(name)
+            + sys.getsizeof(payload) + sum(
+                sys.getsizeof(value) for value in payload.values()
+                if value is not name
+            )
+        )
+
+    def _store(self, item_id, name, payload):
+        """Store an item with its keys, which are left unsorted."""
+        keys = self._keys_for(item_id, name)
+        if len(self.keys) + len(keys) > self.max_entries:
+            self.truncated = True
+            return False
+        self.keys.extend(keys)
+        self.items[item_id] = (name, payload)
+        self.memory += self._item_size(self.items[item_id]) + sum(
+            self._key_size(key) for key in keys
+        )
+        return True
+
+    def load(self, items):
+        """
+        Fill an empty index from (item id, name, payload) triples until it
+        is full, sorting keys once instead of inserting them one by one.
+        """
+        for item in items:
+            if not self._store(*item):
+                break
+        self.keys.sort()
+
+    def add(self, item_id, name, payload):
+        """Insert or replace an item, unless index is full."""
+        self.remove(item_id)
+        length = len(self.keys)
+        if not self._store(item_id, name, payload):
+            return
+        keys = self.keys[length:]
+        del self.keys[length:]
+        for key in keys:
+            insort(self.keys, key)
+
+    def remove(self, item_id):
+        if item_id not in self.items:
+            return
+        item = self.items.pop(item_id)
+        self.memory -= self._item_size(item)
+        for key in self._keys_for(item_id, item[0]):
+            position = bisect_left(self.keys, key)
+            if position < len(self.keys) and self.keys[position] == key:
+                del self.keys[position]
+                self.memory -= self._key_size(key)
+
+    def search(self, prefix, limit):
+        """Return payloads of first `limit` items having a word prefix."""
+        prefix = ' '.join(prefix.casefold().split())
+        found = {}
+        position = bisect_left(self.keys, (prefix,))
+        while len(found) < limit and position < len(self.keys):
+            key, item_id = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(item_id, self.items[item_id][1])
+            position += 1
+        return list(found.values())
+
+    def stats(self):
+        return {
+            'entries': len(self.keys),
+            'items': len(self.items),
+            'memory_bytes': (
+                self.memory + sys.getsizeof(self.keys)
+                + sys.getsizeof(self.items)
+            ),
+            'truncated': self.truncated,
+        }
+
+
+class ModelAutocomplete:
+    """
+    Lazily built per-process index over model names. Expired indexes
+    keep serving requests while a new one is built in another thread,
+    changes made during the build are applied to it before the swap.
+    With `build_in_background` the first index is built the same way
+    and get_index() returns None until it is ready.
+    """
+    index_class = PrefixIndex
+    max_entries_setting = 'AUTOCOMPLETE_MAX_ENTRIES'
+    rebuild_interval_setting = 'AUTOCOMPLETE_REBUILD_INTERVAL'
+    build_in_background = False
+    fields = ()
+    ordering = ('id',)
+
+    def __init__(self, model):
+        self.model = model
+        self.index = None
+        self.built_at = 0
+        # bumped by reset(), builds started before it are discarded
+        self.generation = 0
+        self.lock = threading.Lock()
+        # changes made while a new index is built, None without a build
+        self.pending = None
+        self.rebuild_thread = None
+
+    def get_payload(self, obj):
+        return {field: getattr(obj, field) for field in self.fields}
+
+    def build(self):
+        index = self.index_class(
+            getattr(settings, self.max_entries_setting)
+        )
+        queryset = self.model.objects.order_by(*self.ordering).only(
+            'pk', 'name', *self.fields
+        )
+        index.load(
+            (obj.pk, obj.name, self.get_payload(obj))
+            for obj in queryset.iterator()
+        )
+        return index
+
+    def is_expired(self):
+        return (
+            time.monotonic() - self.built_at
+            > getattr(settings, self.rebuild_interval_setting)
+        )
+
+    def get_index(self):
+        if self.index is None and self.build_in_background:
+            self.start_rebuild()
+        elif self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = self.build()
+                    self.built_at = time.monotonic()
+        elif self.is_expired():
+            self.start_rebuild()
+        return self.index
+
+    def start_rebuild(self):
+        with self.lock:
+            if self.pending is not None:
+                return
+            self.pending = []
+            self.rebuild_thread = threading.Thread(
+                target=self.rebuild, name=f'rebuild-{self.model.__name__}',
+                daemon=True
+            )
+            self.rebuild_thread.start()
+
+    def rebuild(self):
+        """Build a new index without blocking searches and swap it in."""
+        generation = self.generation
+        try:
+            index = self.build()
+            with self.lock:
+                for instance, deleted in self.pending:
+                    self._apply(index, instance, deleted)
+                if self.generation == generation:
+                    self.index = index
+                    self.built_at = time.monotonic()
+        except Exception:
+            # the old index is kept until the next attempt
+            logger.exception(
+                'Rebuild of %s index failed', self.model.__name__
+            )
+        finally:
+            connection.close()
+            with self.lock:
+                self.pending = None
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+            self.generation += 1
+
+    def search(self, prefix, limit):
+        index = self.get_index()
+        # signals change the index in place from other threads
+        with self.lock:
+            return index.search(prefix, limit)
+
+    def _apply(self, index, instance, deleted):
+        if deleted:
+            index.remove(instance.pk)
+        else:
+            index.add(instance.pk, instance.name, self.get_payload(instance))
+
+    def _change(self, instance, deleted):
+        if self.index is None and self.pending is None:
+            return
+        with self.lock:
+            if self.index is not None:
+                self._apply(self.index, instance, deleted)
+            if self.pending is not None:
+                self.pending.append((instance, deleted))
+
+    def update(self, instance):
+        """Apply saved instance to the index, if it is already built."""
+        self._change(instance, deleted=False)
+
+    def delete(self, instance):
+        self._change(instance, deleted=True)
+
+    def stats(self):
+        if self.index is None:
+            return None
+        with self.lock:
+            return self.index.stats()
+
+
+class TitleAutocomplete(ModelAutocomplete):
+    fields = ('id', 'name', 'year')
+    # most reviewed titles are kept when index is truncated
+    ordering = ('-score_count', 'id')
+
+
+class SlugAutocomplete(ModelAutocomplete):
+    fields = ('name', 'slug')
+
+
+autocomplete_indexes = {
+    'titles': TitleAutocomplete(Title),
+    'genres': SlugAutocomplete(Genre),
+    'categories': SlugAutocomplete(Category),
+}
@@ -0,0 +1,163 @@
+import time
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from rest_framework.response import Response
+
+
+def is_shared_cache():
+    """Tell whether the default cache is seen by all server processes."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def _version_key(model):
+    return f'version:{model._meta.label_lower}'
+
+
+def get_version(model):
+    """Return current cache version tag of the model's table."""
+    return cache.get_or_set(_version_key(model), time.time_ns, None)
+
+
+def get_versions(*models):
+    """Return version tags of several tables in one cache round trip."""
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*models):
+    """Invalidate everything cached under the models' version tags."""
+    for model in models:
+        try:
+            cache.incr(_version_key(model))
+        except ValueError:
+            cache.set(_version_key(model), time.time_ns(), None)
+
+
+def request_digest(request, ignored_params=()):
+    """Hash of request path and its non-empty query params in sorted order."""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        if key not in ignored_params
+        for value in values if value
+    )
+    return md5(f'{request.path}?{urlencode(params)}'.encode()).hexdigest()
+
+
+def _count_event(name, event):
+    key = f'stats:{name}:{event}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_hit_stats(name):
+    hits, misses = (
+        cache.get(f'stats:{name}:{event}', 0) for event in ('hits', 'misses')
+    )
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+class AnonymousListCacheMixin:
+    """
+    Caches list responses of anonymous users. Cache key includes
+    normalized query params and version tags of `cache_dependencies`,
+    so any change of those tables makes cached pages unreachable.
+    """
+    cache_name = None
+    cache_dependencies = ()
+
+    def get_cache_variant(self, request):
+        """Return a tag of in-process state the page depends on, if any."""
+        return ''
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        versions = ':'.join(
+            str(version) for version in get_versions(*self.cache_dependencies)
+        )
+        key = ':'.join((
+            'list', self.cache_name, versions,
+            self.get_cache_variant(request), request_digest(request)
+        ))
+        data = cache.get(key)
+        if data is not None:
+            _count_event(self.cache_name, 'hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+        _count_event(self.cache_name, 'misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.LIST_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified to list and detail responses. Both come
+    from a cheap modification stamp of the resource (see
+    get_last_modified), so matching requests get 304 before the main
+    queries and serialization run.
+    """
+
+    def get_last_modified(self):
+        """Return modification time of requested resources or None."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            return handler(request, *args, **kwargs)
+        timestamp = int(last_modified.timestamp())
+        etag = quote_etag(md5(':'.join((
+            request_digest(request),
+            request.accepted_renderer.format,
+            last_modified.isoformat(),
+        )).encode()).hexdigest())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+            if request.user.is_anonymous:
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.HTTP_CACHE_MAX_AGE
+                )
+            else:
+                patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
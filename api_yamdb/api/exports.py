@@ -0,0 +1,27 @@
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.serializers import TitleReadSerializer
+
+
+def iter_titles_ndjson(queryset):
+    """
+    Yield titles of queryset as NDJSON, one chunk of lines per query.
+    Chunks are read by primary key ranges instead of OFFSET, so every
+    query is cheap and only one chunk of titles is held in memory.
+    """
+    chunk_size = settings.TITLES_EXPORT_CHUNK_SIZE
+    last_pk = 0
+    while True:
+        titles = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+        )
+        if not titles:
+            return
+        yield ''.join(
+            json.dumps(title, cls=JSONEncoder, ensure_ascii=False) + '\n'
+            for title in TitleReadSerializer(titles, many=True).data
+        )
+        last_pk = titles[-1].pk
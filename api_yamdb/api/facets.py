@@ -0,0 +1,108 @@
+from django.db.models import Count, Sum
+from django_filters.utils import translate_validation
+
+from api.filters import TitleFilter
+from reviews.models import GenreFacet, Title, TitleFacet
+
+FACETS = ('category', 'genre', 'year')
+
+
+def _format(rows, count):
+    genres, categories, years = rows
+    return {
+        'count': count,
+        'genre': [
+            {'name': row['genre__name'], 'slug': row['genre__slug'],
+             'count': row['count']}
+            for row in genres
+        ],
+        'category': [
+            {'name': row['category__name'], 'slug': row['category__slug'],
+             'count': row['count']}
+            for row in categories
+        ],
+        'year': [
+            {'year': row['year'], 'count': row['count']} for row in years
+        ],
+    }
+
+
+def _facet_rows(querysets, count):
+    """Group every facet queryset by its facet and count titles."""
+    genres, categories, years = querysets
+    return (
+        genres.exclude(genre=None).values(
+            'genre__name', 'genre__slug'
+        ).annotate(count=count).filter(count__gt=0).order_by('genre__slug'),
+        categories.exclude(category=None).values(
+            'category__name', 'category__slug'
+        ).annotate(count=count).filter(count__gt=0).order_by(
+            'category__slug'
+        ),
+        years.values('year').annotate(count=count).filter(
+            count__gt=0
+        ).order_by('year'),
+    )
+
+
+def _counts_from_cells(filters):
+    """Read counts from pre-aggregated cells, when only facets are set."""
+
+    def cells(exclude=None, by_genre=False):
+        lookups = {}
+        if 'category' in filters and exclude != 'category':
+            lookups['category__slug'] = filters['category']
+        if 'year' in filters and exclude != 'year':
+            lookups['year'] = filters['year']
+        if 'genre' in filters and exclude != 'genre':
+            lookups['genre__slug'] = filters['genre']
+        model = GenreFacet if by_genre or 'genre__slug' in lookups else (
+            TitleFacet
+        )
+        return model.objects.filter(**lookups).order_by()
+
+    total = Sum('titles_count')
+    rows = _facet_rows(
+        (cells('genre', by_genre=True), cells('category'), cells('year')),
+        total
+    )
+    return _format(rows, cells().aggregate(count=total)['count'] or 0)
+
+
+def _counts_from_titles(params):
+    """Count titles live, for filters not covered by pre-aggregated cells."""
+
+    def titles(exclude=None):
+        data = params.copy()
+        data.pop(exclude, None)
+        filtered = TitleFilter(data, queryset=Title.objects.all()).qs
+        return Title.objects.filter(
+            pk__in=filtered.order_by().values('pk')
+        ).order_by()
+
+    rows = _facet_rows(
+        (titles('genre'), titles('category'), titles('year')),
+        Count('pk', distinct=True)
+    )
+    return _format(rows, titles().count())
+
+
+def get_title_facets(params):
+    """
+    Return number of titles matching params in total and per every value
+    of each facet. Facet counts ignore the filter of their own facet,
+    so they show what switching to another value would give.
+    """
+    filterset = TitleFilter(params, queryset=Title.objects.all())
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    filters = {
+        name: value
+        for name, value in filterset.form.cleaned_data.items()
+        if value not in (None, '')
+    }
+    if 'year' in filters:
+        filters['year'] = int(filters['year'])
+    if set(filters).issubset(FACETS):
+        return _counts_from_cells(filters)
+    return _counts_from_titles(params)
@@ -1,7 +1,12 @@
 import django_filters
+from rest_framework import filters
 
+from api.fuzzy import title_fuzzy_index
+from reviews.fields import casefold
 from reviews.models import Title
 
+FUZZY_MATCHES_LIMIT = 1000
+
 
 class TitleFilter(django_filters.FilterSet):
     """Custom filter for Title model."""
@@ -10,11 +15,39 @@ class TitleFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
         field_name='name', method='filter_by_partial_match'
     )
+    name_fuzzy = django_filters.CharFilter(method='filter_by_fuzzy_match')
+    search = django_filters.CharFilter(method='filter_by_search')
 
     def filter_by_partial_match(self, queryset, name, value):
         """Method for filtering queryset by partial match of value."""
-        return queryset.filter(name__icontains=value)
+        return queryset.filter(name_search__contains=casefold(value))
+
+    def filter_by_fuzzy_match(self, queryset, name, value):
+        """Method for filtering queryset by name with typos."""
+        title_ids = title_fuzzy_index.search(value, FUZZY_MATCHES_LIMIT)
+        if title_ids is None:
+            # typos are not tolerated until the index is built
+            return self.filter_by_partial_match(queryset, name, value)
+        return queryset.filter(pk__in=title_ids)
+
+    def filter_by_search(self, queryset, name, value):
+        """Method for full-text search ordered by relevance."""
+        return queryset.search(value)
 
     class Meta:
         model = Title
-        fields = ['category', 'genre', 'name', 'year']
+        fields = ['category', 'genre', 'name', 'name_fuzzy', 'year', 'search']
+
+
+class CaseFoldedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter for casefolded shadow columns (see CaseFoldedCharField).
+    Terms are casefolded in Python, so Cyrillic matches regardless of case
+    and no case-insensitive lookup is needed in the database.
+    """
+
+    def get_search_terms(self, request):
+        return [casefold(term) for term in super().get_search_terms(request)]
+
+    def construct_search(self, field_name):
+        return f'{field_name}__contains'
@@ -0,0 +1,209 @@
+import sys
+from array import array
+from collections import Counter
+
+from reviews.models import Title
+
+from api.autocomplete import ModelAutocomplete
+
+
+class EditDistance:
+    """
+    Levenshtein distance from a fixed pattern to any text.
+    Uses bit-parallel algorithm of Myers (in Hyyrö's formulation),
+    that is several times faster than dynamic programming in Python.
+    """
+
+    def __init__(self, pattern):
+        self.length = len(pattern)
+        self.masks = {}
+        for position, char in enumerate(pattern):
+            self.masks[char] = self.masks.get(char, 0) | 1 << position
+
+    def __call__(self, text):
+        if not self.length:
+            return len(text)
+        full = (1 << self.length) - 1
+        high = 1 << (self.length - 1)
+        positive, negative, score = full, 0, self.length
+        for char in text:
+            equal = self.masks.get(char, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            horizontal_positive = negative | (~(horizontal | positive) & full)
+            horizontal_negative = positive & horizontal
+            if horizontal_positive & high:
+                score += 1
+            elif horizontal_negative & high:
+                score -= 1
+            horizontal_positive = (horizontal_positive << 1) | 1
+            horizontal_negative = (horizontal_negative << 1) & full
+            positive = horizontal_negative | (
+                ~(vertical | horizontal_positive) & full
+            )
+            negative = horizontal_positive & vertical & full
+        return score
+
+
+def max_distance(query):
+    """Allowed number of typos grows with query length."""
+    if len(query) <= 3:
+        return 0
+    if len(query) <= 7:
+        return 1
+    return 2
+
+
+class TrigramIndex:
+    """
+    Casefolded names and their words with an inverted index of trigrams.
+    An edit changes at most three trigrams of a key, so only keys sharing
+    enough trigrams with a query are compared with it by EditDistance.
+    Removed items leave their keys in place to be reused.
+    """
+    # edges are padded so short words and first letters have trigrams
+    padding = '\0\0'
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.key_ids = {}
+        self.keys = []
+        self.key_items = []
+        self.postings = {}
+        self.items = {}
+        self.truncated = False
+
+    @staticmethod
+    def _keys_for(name):
+        words = name.casefold().split()
+        return {' '.join(words), *words}
+
+    @classmethod
+    def _trigrams(cls, key):
+        padded = f'{cls.padding}{key}{cls.padding}'
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def _insert(self, key, item_id):
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = self.key_ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.key_items.append([])
+            for trigram in self._trigrams(key):
+                postings = self.postings.get(trigram)
+                if postings is None:
+                    postings = self.postings[trigram] = array('i')
+                postings.append(key_id)
+        self.key_items[key_id].append(item_id)
+
+    def add(self, item_id, name, payload=None):
+        """Insert or replace an item, unless index is full."""
+        self.remove(item_id)
+        keys = self._keys_for(name)
+        new_keys = sum(key not in self.key_ids for key in keys)
+        if len(self.keys) + new_keys > self.max_entries:
+            self.truncated = True
+            return
+        for key in keys:
+            self._insert(key, item_id)
+        self.items[item_id] = name
+
+    def load(self, items):
+        """Fill an empty index from (item id, name, payload) triples."""
+        for item in items:
+            self.add(*item)
+            if self.truncated:
+                break
+
+    def remove(self, item_id):
+        name = self.items.pop(item_id, None)
+        if name is None:
+            return
+        for key in self._keys_for(name):
+            self.key_items[self.key_ids[key]].remove(item_id)
+
+    def _candidates(self, query, tolerance):
+        """Return ids of keys that may be within tolerance of query."""
+        if not tolerance:
+            key_id = self.key_ids.get(query)
+            return () if key_id is None else (key_id,)
+        trigrams = self._trigrams(query)
+        threshold = len(trigrams) - 3 * tolerance
+        if threshold <= 0:
+            # repetitive queries like "аааааааа" can't be filtered
+            return range(len(self.keys))
+        counts = Counter()
+        for trigram in trigrams:
+            counts.update(self.postings.get(trigram, ()))
+        return [
+            key_id for key_id, count in counts.items() if count >= threshold
+        ]
+
+    def search(self, query, limit):
+        """Return ids of up to `limit` items closest to query."""
+        query = ' '.join(query.casefold().split())
+        tolerance = max_distance(query)
+        distance_to = EditDistance(query)
+        found = {}
+        for key_id in self._candidates(query, tolerance):
+            key, item_ids = self.keys[key_id], self.key_items[key_id]
+            if not item_ids or abs(len(key) - len(query)) > tolerance:
+                continue
+            distance = distance_to(key)
+            if distance <= tolerance:
+                for item_id in item_ids:
+                    found[item_id] = min(
+                        found.get(item_id, distance), distance
+                    )
+        closest = sorted(found, key=lambda item_id: (found[item_id], item_id))
+        return closest[:limit]
+
+    def stats(self):
+        containers = (
+            self.key_ids, self.keys, self.key_items, self.postings,
+            self.items,
+        )
+        return {
+            'entries': len(self.keys),
+            'items': len(self.items),
+            'memory_bytes': sum(
+                sys.getsizeof(container) for container in containers
+            ) + sum(
+                sys.getsizeof(key) + sys.getsizeof(item_ids)
+                for key, item_ids in zip(self.keys, self.key_items)
+            ) + sum(
+                sys.getsizeof(trigram) + sys.getsizeof(postings)
+                for trigram, postings in self.postings.items()
+            ) + sum(
+                sys.getsizeof(item_id) + sys.getsizeof(name)
+                for item_id, name in self.items.items()
+            ),
+            'truncated': self.truncated,
+        }
+
+
+class TitleFuzzySearch(ModelAutocomplete):
+    index_class = TrigramIndex
+    max_entries_setting = 'FUZZY_SEARCH_MAX_ENTRIES'
+    build_in_background = True
+    # most reviewed titles are kept when index is truncated
+    ordering = ('-score_count', 'id')
+
+    def search(self, query, limit):
+        """Return ids of closest titles, or None while index is built."""
+        index = self.get_index()
+        if index is None:
+            return None
+        with self.lock:
+            return index.search(query, limit)
+
+    def get_state(self):
+        """Tell whether search covers all titles, see X-Fuzzy-Search."""
+        if self.index is None:
+            return 'building'
+        if self.index.truncated:
+            return 'truncated'
+        return 'complete'
+
+
+title_fuzzy_index = TitleFuzzySearch(Title)
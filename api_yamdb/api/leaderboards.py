@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from reviews.models import Title
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboards:
+    """
+    Sorted lists of rated titles for all titles, every genre, every
+    category and every (genre, category) pair, so top titles are read
+    from the head of a list instead of sorting the table.
+    """
+
+    def __init__(self, min_reviews):
+        self.min_reviews = min_reviews
+        self.boards = defaultdict(list)
+        self.entries = {}
+
+    @staticmethod
+    def _boards_for(category, genres):
+        boards = {(None, None)}
+        if category is not None:
+            boards.add((None, category))
+        for genre in genres:
+            boards.add((genre, None))
+            if category is not None:
+                boards.add((genre, category))
+        return boards
+
+    def add(self, title_id, rating, score_count, category, genres):
+        """Insert or replace a title, unless it has too few reviews."""
+        self.remove(title_id)
+        if rating is None or score_count < max(self.min_reviews, 1):
+            return
+        key = (-rating, -score_count, title_id)
+        boards = self._boards_for(category, genres)
+        for board in boards:
+            insort(self.boards[board], key)
+        self.entries[title_id] = (key, boards)
+
+    def remove(self, title_id):
+        if title_id not in self.entries:
+            return
+        key, boards = self.entries.pop(title_id)
+        for board in boards:
+            keys = self.boards[board]
+            del keys[bisect_left(keys, key)]
+            if not keys:
+                del self.boards[board]
+
+    def top(self, genre=None, category=None, limit=10, min_reviews=0):
+        """Return ids of best rated titles, most reviewed first on ties."""
+        found = []
+        for _, score_count, title_id in self.boards.get((genre, category), ()):
+            if len(found) == limit:
+                break
+            if -score_count >= min_reviews:
+                found.append(title_id)
+        return found
+
+    def stats(self):
+        return {
+            'boards': len(self.boards),
+            'entries': sum(len(keys) for keys in self.boards.values()),
+            'titles': len(self.entries),
+        }
+
+
+class TitleLeaderboards:
+    """
+    Lazily built per-process leaderboards of titles by rating. Expired
+    leaderboards keep serving requests while new ones are built in
+    another thread, titles changed during the build are reloaded into
+    them before the swap.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.built_at = 0
+        # bumped by reset(), builds started before it are discarded
+        self.generation = 0
+        self.lock = threading.Lock()
+        # ids of titles changed while new leaderboards are built
+        self.pending = None
+        self.rebuild_thread = None
+
+    @staticmethod
+    def _load(titles):
+        """Return title rows with genre slugs, ordered as leaderboards."""
+        rows = {}
+        queryset = titles.order_by('-rating', '-score_count', 'pk')
+        for pk, rating, score_count, category, genre in queryset.values_list(
+            'pk', 'rating', 'score_count', 'category__slug', 'genre__slug'
+        ).iterator():
+            row = rows.setdefault(pk, (rating, score_count, category, []))
+            if genre is not None:
+                row[3].append(genre)
+        return rows
+
+    @staticmethod
+    def _apply(index, title_ids, rows):
+        for pk in title_ids:
+            if pk in rows:
+                index.add(pk, *rows[pk])
+            else:
+                index.remove(pk)
+
+    def build(self):
+        index = Leaderboards(settings.TOP_TITLES_MIN_REVIEWS)
+        titles = Title.objects.filter(
+            score_count__gte=max(index.min_reviews, 1)
+        )
+        # rows come sorted, so every insert appends to the boards
+        for pk, row in self._load(titles).items():
+            index.add(pk, *row)
+        return index
+
+    def is_expired(self):
+        return (
+            time.monotonic() - self.built_at
+            > settings.LEADERBOARD_REBUILD_INTERVAL
+        )
+
+    def get_index(self):
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = self.build()
+                    self.built_at = time.monotonic()
+        elif self.is_expired():
+            self.start_rebuild()
+        return self.index
+
+    def start_rebuild(self):
+        with self.lock:
+            if self.pending is not None:
+                return
+            self.pending = set()
+            self.rebuild_thread = threading.Thread(
+                target=self.rebuild, name='rebuild-leaderboards',
+                daemon=True
+            )
+            self.rebuild_thread.start()
+
+    def rebuild(self):
+        """Build new leaderboards without blocking requests, swap them in."""
+        generation = self.generation
+        try:
+            index = self.build()
+            while True:
+                with self.lock:
+                    title_ids, self.pending = self.pending, set()
+                    if not title_ids:
+                        if self.generation == generation:
+                            self.index = index
+                            self.built_at = time.monotonic()
+                        break
+                rows = self._load(Title.objects.filter(pk__in=title_ids))
+                self._apply(index, title_ids, rows)
+        except Exception:
+            # the old leaderboards are kept until the next attempt
+            logger.exception('Leaderboards rebuild failed')
+        finally:
+            connection.close()
+            with self.lock:
+                self.pending = None
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+            self.generation += 1
+
+    def top(self, genre=None, category=None, limit=10, min_reviews=0):
+        index = self.get_index()
+        # signals change boards in place from other threads
+        with self.lock:
+            return index.top(genre, category, limit, min_reviews)
+
+    def _change(self, title_ids, rows):
+        with self.lock:
+            if self.index is not None:
+                self._apply(self.index, title_ids, rows)
+            if self.pending is not None:
+                self.pending.update(title_ids)
+
+    def update(self, title_ids):
+        """Reload given titles into leaderboards, if they are built."""
+        if self.index is None and self.pending is None:
+            return
+        self._change(
+            title_ids, self._load(Title.objects.filter(pk__in=title_ids))
+        )
+
+    def delete(self, title_id):
+        if self.index is None and self.pending is None:
+            return
+        self._change([title_id], {})
+
+    def stats(self):
+        if self.index is None:
+            return None
+        with self.lock:
+            return self.index.stats()
+
+
+title_leaderboards = TitleLeaderboards()
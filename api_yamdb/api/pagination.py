@@ -0,0 +1,130 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from api.cache import get_version, is_shared_cache, request_digest
+
+
+def estimate_count(queryset):
+    """Return PostgreSQL planner estimate of the queryset row count."""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator caching total count under `count_cache_key`.
+    Counts above PAGINATION_COUNT_ESTIMATE_THRESHOLD are replaced
+    with planner estimates where the database backend provides them.
+    Nothing is cached in a local-memory cache: version tags bumped by
+    one process would not reach counts cached by the others.
+    """
+
+    def __init__(self, object_list, per_page, count_cache_key=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_cache_key = count_cache_key
+        self.count_estimated = False
+
+    @cached_property
+    def count(self):
+        if not is_shared_cache():
+            return self._count()
+        cached = cache.get(self.count_cache_key)
+        if cached is not None:
+            count, self.count_estimated = cached
+            return count
+        count = self._count()
+        cache.set(
+            self.count_cache_key,
+            (count, self.count_estimated),
+            settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        )
+        return count
+
+    def _count(self):
+        threshold = settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+        queryset = self.object_list
+        if not threshold or connections[queryset.db].vendor != 'postgresql':
+            return queryset.count()
+        bounded_count = queryset[:threshold + 1].count()
+        if bounded_count <= threshold:
+            return bounded_count
+        self.count_estimated = True
+        return max(estimate_count(queryset), bounded_count)
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Page number pagination with cached total count.
+    Cache key includes endpoint, filter params, model version tag and
+    the view's cache variant (see AnonymousListCacheMixin), so counts
+    are dropped as soon as rows are saved or deleted.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            count_cache_key=self.get_count_cache_key(
+                queryset, request, view
+            )
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count_cache_key(self, queryset, request, view=None):
+        digest = request_digest(request, (self.page_query_param,))
+        variant = ''
+        if hasattr(view, 'get_cache_variant'):
+            variant = view.get_cache_variant(request)
+        return f'count:{get_version(queryset.model)}:{variant}:{digest}'
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.page.paginator.count_estimated:
+            response.data['count_estimated'] = True
+        return response
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+
+
+class PubDateCursorPagination(CursorPagination):
+    ordering = ('pub_date', 'id')
+
+
+class CursorOptInPagination(CachedCountPagination):
+    """
+    Page number pagination switched to keyset mode by `cursor` param.
+    Pass an empty `?cursor=` to get the first page, then follow
+    opaque `next`/`previous` links. No COUNT query is made in this mode.
+    """
+    cursor_pagination_class = IdCursorPagination
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class PubDateCursorOptInPagination(CursorOptInPagination):
+    cursor_pagination_class = PubDateCursorPagination
@@ -1,6 +1,9 @@
+from django.conf import settings
+from django.db import connection, transaction
 from rest_framework import serializers
 
 from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.signals import bulk_created
 from users.models import CustomUser
 
 
@@ -43,6 +46,21 @@ class ConfirmationCodeSerializer(serializers.Serializer):
     confirmation_code = serializers.CharField(required=True)
 
 
+class AutocompleteSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=256, required=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class TopTitlesSerializer(serializers.Serializer):
+    genre = serializers.SlugField(required=False)
+    category = serializers.SlugField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    min_reviews = serializers.IntegerField(
+        min_value=settings.TOP_TITLES_MIN_REVIEWS,
+        default=settings.TOP_TITLES_MIN_REVIEWS
+    )
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
@@ -131,3 +149,118 @@ class TitleWriteSerializer(TitleReadSerializer):
         slug_field='slug',
         queryset=Category.objects.all()
     )
+
+
+def bulk_create_titles(titles, genres):
+    """Insert titles with lists of their genres and set primary keys."""
+    if connection.features.can_return_ids_from_bulk_insert:
+        Title.objects.bulk_create(titles)
+    elif connection.vendor == 'sqlite':
+        Title.objects.bulk_create(titles)
+        # the transaction holds the database write lock since the first
+        # insert, so the newest rows are the inserted ones
+        pks = Title.objects.order_by('-pk').values_list('pk', flat=True)
+        for title, pk in zip(titles, reversed(pks[:len(titles)])):
+            title.pk = pk
+    else:
+        # MySQL may interleave ids of concurrent inserts, titles are saved
+        # one by one and their signals keep derived data up to date
+        for title, title_genres in zip(titles, genres):
+            title.save(force_insert=True)
+            title.genre.set(title_genres)
+        return
+    through = Title.genre.through
+    through.objects.bulk_create(
+        through(title_id=title.pk, genre_id=genre.pk)
+        for title, title_genres in zip(titles, genres)
+        for genre in title_genres
+    )
+    bulk_created.send(sender=Title, instances=titles)
+
+
+class TitleBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates all titles together, resolving genre and category slugs
+    of the whole batch with one query per model.
+    """
+    does_not_exist = serializers.SlugRelatedField.default_error_messages[
+        'does_not_exist'
+    ]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+        if len(data) > settings.TITLES_BULK_LIMIT:
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    'Можно добавить не больше '
+                    f'{settings.TITLES_BULK_LIMIT} произведений за раз'
+                ]
+            })
+        items, errors = [], []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                items.append(None)
+                errors.append(exc.detail)
+        self.resolve_slugs(items, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def resolve_slugs(self, items, errors):
+        """Replace slugs of valid items by objects or add item errors."""
+        valid = [item for item in items if item is not None]
+        genres = Genre.objects.in_bulk(
+            {slug for item in valid for slug in item['genre']},
+            field_name='slug'
+        )
+        categories = Category.objects.in_bulk(
+            {item['category'] for item in valid}, field_name='slug'
+        )
+        for item, item_errors in zip(items, errors):
+            if item is None:
+                continue
+            missing = [slug for slug in item['genre'] if slug not in genres]
+            if missing:
+                item_errors['genre'] = [
+                    self.does_not_exist.format(slug_name='slug', value=slug)
+                    for slug in missing
+                ]
+            if item['category'] not in categories:
+                item_errors['category'] = [self.does_not_exist.format(
+                    slug_name='slug', value=item['category']
+                )]
+            if not item_errors:
+                item['genre'] = [genres[slug] for slug in dict.fromkeys(
+                    item['genre']
+                )]
+                item['category'] = categories[item['category']]
+
+    def create(self, validated_data):
+        titles = [
+            Title(
+                name=item['name'],
+                year=item['year'],
+                description=item.get('description'),
+                category=item['category'],
+            )
+            for item in validated_data
+        ]
+        with transaction.atomic():
+            bulk_create_titles(
+                titles, [item['genre'] for item in validated_data]
+            )
+        return titles
+
+
+class TitleBulkSerializer(serializers.ModelSerializer):
+    genre = serializers.ListField(child=serializers.SlugField())
+    category = serializers.SlugField()
+
+    class Meta:
+        model = Title
+        fields = ('name', 'year', 'description', 'genre', 'category')
+        list_serializer_class = TitleBulkListSerializer
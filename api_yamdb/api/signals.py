@@ -0,0 +1,114 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.autocomplete import autocomplete_indexes
+from api.cache import bump_version
+from api.fuzzy import title_fuzzy_index
+from api.leaderboards import title_leaderboards
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.signals import bulk_created, bulk_updated, rating_changed
+from users.models import CustomUser
+
+VERSIONED_MODELS = (Category, Comment, CustomUser, Genre, Review, Title)
+
+NAME_INDEXES = (*autocomplete_indexes.values(), title_fuzzy_index)
+
+
+@receiver(post_save)
+def bump_version_on_save(sender, **kwargs):
+    if sender in VERSIONED_MODELS:
+        bump_version(sender)
+
+
+@receiver(post_delete)
+def bump_version_on_delete(sender, **kwargs):
+    if sender in VERSIONED_MODELS:
+        bump_version(sender)
+    if sender in (Category, Genre):
+        # titles filtered by deleted genre or category change too
+        bump_version(Title)
+
+
+@receiver(bulk_created)
+@receiver(bulk_updated)
+def bump_version_on_bulk_change(sender, **kwargs):
+    if sender in VERSIONED_MODELS:
+        bump_version(sender)
+    if sender is Title.genre.through:
+        bump_version(Title)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_version_on_title_genre_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version(Title)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def update_autocomplete_on_save(sender, instance, **kwargs):
+    for index in NAME_INDEXES:
+        if index.model is sender:
+            index.update(instance)
+
+
+@receiver(bulk_created)
+@receiver(bulk_updated)
+def update_autocomplete_on_bulk_change(sender, instances, **kwargs):
+    for index in NAME_INDEXES:
+        if index.model is not sender:
+            continue
+        if any(instance.pk is None for instance in instances):
+            # ids of inserted rows are unknown, rebuild on next search
+            index.reset()
+            continue
+        for instance in instances:
+            index.update(instance)
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    for index in NAME_INDEXES:
+        if index.model is sender:
+            index.delete(instance)
+
+
+@receiver(rating_changed)
+def update_leaderboards_on_rating_change(sender, title_ids, **kwargs):
+    title_leaderboards.update(title_ids)
+
+
+@receiver(post_save, sender=Title)
+def update_leaderboards_on_title_save(sender, instance, **kwargs):
+    title_leaderboards.update([instance.pk])
+
+
+@receiver(post_delete, sender=Title)
+def update_leaderboards_on_title_delete(sender, instance, **kwargs):
+    title_leaderboards.delete(instance.pk)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_leaderboards_on_title_genre_change(sender, instance, action,
+                                              reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        title_leaderboards.update([instance.pk])
+    elif action == 'post_clear':
+        title_leaderboards.reset()
+    else:
+        title_leaderboards.update(list(pk_set))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def reset_leaderboards_on_slug_change(sender, created=False, **kwargs):
+    """Leaderboards are keyed by slugs, new genres or categories are empty."""
+    if not created:
+        title_leaderboards.reset()
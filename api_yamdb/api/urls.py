@@ -2,9 +2,10 @@ from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
-from .views import (CategoryViewSet, CheckTokenView, CommentViewSet,
-                    CreateUserView, GenreViewSet, ReviewViewSet, TitleViewSet,
-                    UserViewSet)
+from .views import (AnalyticsView, AutocompleteStatsView, AutocompleteView,
+                    CacheStatsView, CategoryViewSet, CheckTokenView,
+                    CommentViewSet, CreateUserView, GenreViewSet,
+                    ReviewViewSet, TitleViewSet, UserViewSet)
 
 v1_router = DefaultRouter()
 
@@ -37,5 +38,14 @@ v1_router.register(
 urlpatterns = [
     path('v1/', include(v1_router.urls)),
     path('v1/auth/signup/', CreateUserView.as_view(), name='signup'),
-    path('v1/auth/token/', CheckTokenView.as_view(), name='jwt_token')
+    path('v1/auth/token/', CheckTokenView.as_view(), name='jwt_token'),
+    path(
+        'v1/autocomplete/', AutocompleteView.as_view(), name='autocomplete'
+    ),
+    path(
+        'v1/autocomplete/stats/', AutocompleteStatsView.as_view(),
+        name='autocomplete_stats'
+    ),
+    path('v1/analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('v1/cache/stats/', CacheStatsView.as_view(), name='cache_stats'),
 ]
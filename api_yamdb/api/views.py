@@ -1,11 +1,11 @@
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
-from django.db.models import Avg
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 
-from rest_framework import filters, mixins, status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly,
                                         SAFE_METHODS)
@@ -14,14 +14,26 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import AccessToken
 
 import api.filters as custom_filters
+from api.analytics import catalog_analytics
+from api.autocomplete import autocomplete_indexes
+from api.cache import (AnonymousListCacheMixin, ConditionalGetMixin,
+                       get_hit_stats)
+from api.exports import iter_titles_ndjson
+from api.facets import get_title_facets
+from api.fuzzy import title_fuzzy_index
+from api.leaderboards import title_leaderboards
+from api.pagination import (CursorOptInPagination,
+                            PubDateCursorOptInPagination)
 from reviews.models import Category, Genre, Review, Title
 from users.models import CustomUser
 from api.permissions import (IsAdmin, IsAdminOrReadOnly,
                              IsAuthorOrModeratorOrAdminOrReadOnly)
-from api.serializers import (CategorySerializer, CommentSerializer,
+from api.serializers import (AutocompleteSerializer,
+                             CategorySerializer, CommentSerializer,
                              ConfirmationCodeSerializer, CreateUserSerializer,
                              GenreSerializer, ReviewSerializer,
-                             TitleReadSerializer, TitleWriteSerializer,
+                             TitleBulkSerializer, TitleReadSerializer,
+                             TitleWriteSerializer, TopTitlesSerializer,
                              UserSerializer)
 from api_yamdb.settings import DEFAULT_FROM_EMAIL
 
@@ -67,13 +79,52 @@ class CheckTokenView(APIView):
         )
 
 
+class AutocompleteView(APIView):
+    def get(self, request):
+        serializer = AutocompleteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data.get('q')
+        limit = serializer.validated_data.get('limit')
+        return Response({
+            name: index.search(query, limit)
+            for name, index in autocomplete_indexes.items()
+        })
+
+
+class AutocompleteStatsView(APIView):
+    permission_classes = (IsAuthenticated, IsAdmin,)
+
+    def get(self, request):
+        stats = {
+            name: index.stats()
+            for name, index in autocomplete_indexes.items()
+        }
+        stats['titles_fuzzy'] = title_fuzzy_index.stats()
+        stats['titles_top'] = title_leaderboards.stats()
+        return Response(stats)
+
+
+class AnalyticsView(APIView):
+    permission_classes = (IsAuthenticated, IsAdmin,)
+
+    def get(self, request):
+        return Response(catalog_analytics.get())
+
+
+class CacheStatsView(APIView):
+    permission_classes = (IsAuthenticated, IsAdmin,)
+
+    def get(self, request):
+        return Response({'titles': get_hit_stats('titles')})
+
+
 class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated, IsAdmin,)
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (custom_filters.CaseFoldedSearchFilter,)
     lookup_field = 'username'
     queryset = CustomUser.objects.all()
-    search_fields = ('username',)
+    search_fields = ('username_search',)
 
     @action(
         detail=False, methods=('get', 'patch',),
@@ -92,11 +143,16 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,
                           IsAuthorOrModeratorOrAdminOrReadOnly)
-    pagination_class = PageNumberPagination
+    pagination_class = PubDateCursorOptInPagination
+
+    def get_last_modified(self):
+        return Title.objects.filter(
+            id=self.kwargs["title_id"]
+        ).values_list('reviews_modified', flat=True).first()
 
     def get_queryset(self):
         title = get_object_or_404(Title, id=self.kwargs["title_id"])
@@ -107,11 +163,17 @@ class ReviewViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user, title=title)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,
                           IsAuthorOrModeratorOrAdminOrReadOnly)
-    pagination_class = PageNumberPagination
+    pagination_class = PubDateCursorOptInPagination
+
+    def get_last_modified(self):
+        return Review.objects.filter(
+            id=self.kwargs["review_id"],
+            title__id=self.kwargs["title_id"],
+        ).values_list('comments_modified', flat=True).first()
 
     def get_queryset(self):
         review = get_object_or_404(
@@ -135,8 +197,8 @@ class AbstractCategoryViewSet(mixins.ListModelMixin,
                               mixins.DestroyModelMixin,
                               viewsets.GenericViewSet):
     permission_classes = [IsAdminOrReadOnly, ]
-    filter_backends = [filters.SearchFilter, ]
-    search_fields = ['name', ]
+    filter_backends = [custom_filters.CaseFoldedSearchFilter, ]
+    search_fields = ['name_search', ]
     lookup_field = 'slug'
 
 
@@ -150,10 +212,85 @@ class CategoryViewSet(AbstractCategoryViewSet):
     serializer_class = CategorySerializer
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(rating=Avg('reviews__score'))
+class TitleViewSet(AnonymousListCacheMixin, ConditionalGetMixin,
+                   viewsets.ModelViewSet):
+    queryset = Title.objects.select_related('category').prefetch_related(
+        Prefetch('genre', queryset=Genre.objects.all())
+    )
     permission_classes = [IsAdminOrReadOnly, ]
     filterset_class = custom_filters.TitleFilter
+    pagination_class = CursorOptInPagination
+    cache_name = 'titles'
+    # rating comes from reviews, genre and category names are nested
+    cache_dependencies = (Title, Genre, Category, Review)
+    # state of title_fuzzy_index for requests filtered by name_fuzzy
+    fuzzy_search_state = ''
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # taken before filtering, the index may be swapped in meanwhile
+        if (self.action in ('list', 'facets', 'export')
+                and 'name_fuzzy' in request.query_params):
+            self.fuzzy_search_state = title_fuzzy_index.get_state()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.fuzzy_search_state:
+            response['X-Fuzzy-Search'] = self.fuzzy_search_state
+        return response
+
+    def get_cache_variant(self, request):
+        return self.fuzzy_search_state
+
+    def get_last_modified(self):
+        if self.action != 'retrieve':
+            return None
+        return Title.objects.filter(
+            pk=self.kwargs['pk']
+        ).values_list('modified', flat=True).first()
+
+    @action(detail=False, methods=('get',), url_path='facets')
+    def facets(self, request):
+        return Response(get_title_facets(request.query_params))
+
+    @action(detail=False, methods=('post',), url_path='bulk')
+    def bulk(self, request):
+        serializer = TitleBulkSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        titles = serializer.save()
+        created = self.get_queryset().in_bulk([title.pk for title in titles])
+        return Response(
+            TitleReadSerializer(
+                [created[title.pk] for title in titles], many=True
+            ).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='export',
+        permission_classes=(IsAuthenticated, IsAdmin)
+    )
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(
+            iter_titles_ndjson(queryset),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+
+    @action(detail=False, methods=('get',), url_path='top')
+    def top(self, request):
+        params = TopTitlesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        title_ids = title_leaderboards.top(**params.validated_data)
+        titles = self.get_queryset().in_bulk(title_ids)
+        serializer = self.get_serializer(
+            [titles[pk] for pk in title_ids if pk in titles], many=True
+        )
+        return Response(serializer.data)
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
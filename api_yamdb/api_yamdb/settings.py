@@ -76,6 +76,18 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'yamdb'),
+    }
+}
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -119,12 +131,66 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
+        'api.filters.CaseFoldedSearchFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CachedCountPagination',
     'PAGE_SIZE': 10,
 }
 
+# Shared caches may reuse anonymous responses without revalidation
+# for this number of seconds, afterwards ETag is checked
+HTTP_CACHE_MAX_AGE = 0
+
+# Anonymous list responses are cached for this number of seconds
+LIST_CACHE_TIMEOUT = 300
+
+# Total counts of paginated lists are cached for this number of seconds.
+# Needs a cache shared by all processes (CACHE_BACKEND), counts are not
+# cached with the default local-memory backend
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# Above this number of rows planner estimates are returned instead of counts
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 100000
+
+# Autocomplete index is kept in memory of every process and rebuilt
+# from the database at this interval to pick up changes made by others
+AUTOCOMPLETE_MAX_ENTRIES = 500000
+AUTOCOMPLETE_REBUILD_INTERVAL = 600
+
+# entries are distinct names and words, a title adds up to four of them;
+# with trigrams an entry takes about 600 bytes, 400000 is about 240 MB
+FUZZY_SEARCH_MAX_ENTRIES = 400000
+
+# Titles with fewer reviews are left out of top rated leaderboards,
+# which are kept in memory of every process and rebuilt at this interval
+TOP_TITLES_MIN_REVIEWS = 1
+LEADERBOARD_REBUILD_INTERVAL = 600
+
+# Maximum number of titles in one request to the bulk creation endpoint
+TITLES_BULK_LIMIT = 1000
+
+# Titles are streamed by the export endpoint in chunks of this size
+TITLES_EXPORT_CHUNK_SIZE = 500
+
+# Files uploaded for import in admin and reports of their rejected rows
+# are kept here, imports run in a background thread in batches of rows
+IMPORT_JOBS_DIR = os.path.join(BASE_DIR, 'imports')
+IMPORT_JOB_BATCH_SIZE = 1000
+
+# Workers touch their queued and running jobs at this interval, jobs
+# without heartbeats for the timeout are interrupted and can be restarted
+IMPORT_JOB_HEARTBEAT_INTERVAL = 10
+IMPORT_JOB_HEARTBEAT_TIMEOUT = 60
+
+# Columnar .npy snapshot of reviews written by snapshot_reviews
+REVIEWS_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'snapshots')
+
+# Score distributions of the analytics endpoint are cached for this number
+# of seconds, reviews are read into memory in chunks of this size
+ANALYTICS_REFRESH_INTERVAL = 3600
+ANALYTICS_CHUNK_SIZE = 100000
+ANALYTICS_PERCENTILES = (25, 50, 75, 90)
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
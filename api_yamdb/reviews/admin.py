@@ -1,7 +1,17 @@
+from django import forms
 from django.contrib import admin
-from django.db.models import Avg
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.import_jobs import import_jobs
+from reviews.importer import FORMAT_SUFFIXES
+from reviews.management.commands._csv_data_relations import csv_data_relation
+from reviews.models import (Category, Comment, Genre, ImportedFile, ImportJob,
+                            Review, Title)
 
 
 @admin.register(Genre)
@@ -19,7 +29,7 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(Title)
 class TitleAdmin(admin.ModelAdmin):
     list_display = (
-        'pk', 'name', 'year', 'get_rating', 'get_genres', 'category'
+        'pk', 'name', 'year', 'rating', 'get_genres', 'category'
     )
     search_fields = ('name',)
     list_filter = ('year', 'category')
@@ -30,10 +40,6 @@ class TitleAdmin(admin.ModelAdmin):
     def get_genres(self, obj):
         return "/".join([genre.name for genre in obj.genre.all()])
 
-    def get_rating(self, obj):
-        avg_rating = obj.reviews.all().aggregate(Avg('score'))['score__avg']
-        return int(avg_rating) if avg_rating else None
-
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -46,3 +52,126 @@ class ReviewAdmin(admin.ModelAdmin):
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'review', 'pub_date')
+
+
+@admin.register(ImportedFile)
+class ImportedFileAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'sha256', 'imported_at')
+    readonly_fields = ('filename', 'sha256', 'imported_at')
+
+
+class ImportJobForm(forms.ModelForm):
+    filename = forms.ChoiceField(
+        choices=[
+            (pair['filename'], pair['filename']) for pair in csv_data_relation
+        ],
+        label='Таблица'
+    )
+
+    class Meta:
+        model = ImportJob
+        fields = ('filename', 'file', 'upsert')
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        name = file.name.lower()
+        if name.endswith('.gz'):
+            name = name[:-len('.gz')]
+        if not name.endswith(tuple(FORMAT_SUFFIXES)):
+            raise forms.ValidationError(
+                'Поддерживаются файлы с расширениями: '
+                f'{", ".join(FORMAT_SUFFIXES)}, возможно сжатые gzip (.gz)'
+            )
+        return file
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    form = ImportJobForm
+    list_display = (
+        'pk', 'filename', 'get_status', 'get_progress', 'created', 'updated',
+        'rejected', 'uploaded_at', 'finished_at'
+    )
+    list_filter = ('status', 'filename')
+    actions = ('restart',)
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return ()
+        return (
+            'filename', 'file', 'upsert', 'size', 'get_status', 'get_progress',
+            'created', 'updated', 'rejected', 'get_report', 'log',
+            'uploaded_at', 'finished_at'
+        )
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ('filename', 'file', 'upsert')
+        return self.get_readonly_fields(request, obj)
+
+    def get_status(self, obj):
+        if obj.is_orphaned:
+            return 'Прервана'
+        return obj.get_status_display()
+    get_status.short_description = 'Статус'
+
+    def get_progress(self, obj):
+        rows, percent = obj.get_progress()
+        if percent is None:
+            return f'{rows} строк'
+        return f'{percent}% ({rows} строк)'
+    get_progress.short_description = 'Обработано'
+
+    def get_report(self, obj):
+        if not obj.report:
+            return '-'
+        return format_html(
+            '<a href="{}">Скачать</a>',
+            reverse('admin:reviews_importjob_report', args=[obj.pk])
+        )
+    get_report.short_description = 'Отчёт об отклонённых строках'
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/report/',
+                self.admin_site.admin_view(self.report_view),
+                name='reviews_importjob_report'
+            ),
+        ] + super().get_urls()
+
+    def report_view(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        if not self.has_view_permission(request, job) or not job.report:
+            raise Http404
+        return FileResponse(
+            job.report.open('rb'), as_attachment=True,
+            filename=f'{job.filename}.rejected.csv'
+        )
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.size = obj.file.size
+        super().save_model(request, obj, form, change)
+        if not change:
+            # the upload is processed in background after the response
+            transaction.on_commit(lambda: import_jobs.enqueue(obj.pk))
+
+    def restart(self, request, queryset):
+        """
+        Queue jobs again, continuing imports from their checkpoints.
+        Active jobs are skipped, unless their worker is gone.
+        """
+        jobs = list(queryset.exclude(
+            status__in=(ImportJob.PENDING, ImportJob.RUNNING),
+            heartbeat_at__gte=ImportJob.get_heartbeat_deadline()
+        ))
+        for job in jobs:
+            job.status = ImportJob.PENDING
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=('status', 'heartbeat_at'))
+            transaction.on_commit(
+                lambda pk=job.pk: import_jobs.enqueue(pk)
+            )
+        self.message_user(request, f'Перезапущено загрузок: {len(jobs)}')
+    restart.short_description = 'Перезапустить выбранные загрузки'
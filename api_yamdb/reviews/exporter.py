@@ -0,0 +1,79 @@
+import csv
+import gzip
+import json
+from datetime import date, time
+
+from django.apps import apps
+
+# gzip level trading size for speed, 9 is several times slower
+GZIP_LEVEL = 6
+
+
+def get_export_fields(model):
+    """
+    Return fields written by export_data: concrete fields without the
+    derived ones (search copies, stored ratings), which import_csv and
+    signals fill by themselves. auto_now_add dates are kept.
+    """
+    return [
+        field for field in model._meta.concrete_fields
+        if field.editable or getattr(field, 'auto_now_add', False)
+    ]
+
+
+def json_default(value):
+    """Encode dates as ISO 8601 without loss of precision."""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def write_csv(stream, columns, rows):
+    """Write header and rows, None as empty string like in source files."""
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    count = 0
+    for count, values in enumerate(rows, 1):
+        writer.writerow(values)
+    return count
+
+
+def write_ndjson(stream, columns, rows):
+    """Write every row as json object on its own line."""
+    count = 0
+    for count, values in enumerate(rows, 1):
+        stream.write(json.dumps(
+            dict(zip(columns, values)), ensure_ascii=False,
+            default=json_default
+        ))
+        stream.write('\n')
+    return count
+
+
+WRITERS = {
+    'csv': write_csv,
+    'ndjson': write_ndjson,
+}
+
+
+def export_table(label, path, file_format, compress, chunk_size):
+    """
+    Write all rows of model to path, reading them in chunks from a
+    server-side cursor, and return their number. The file is written
+    under a temporary name and renamed when complete.
+    """
+    model = apps.get_model(label)
+    columns = [field.attname for field in get_export_fields(model)]
+    rows = model._default_manager.order_by('pk').values_list(
+        *columns
+    ).iterator(chunk_size=chunk_size)
+    partial = path.with_name(f'{path.name}.partial')
+    if compress:
+        stream = gzip.open(partial, 'wt', compresslevel=GZIP_LEVEL,
+                           encoding='utf-8', newline='')
+    else:
+        stream = open(partial, 'w', encoding='utf-8', newline='')
+    with stream:
+        count = WRITERS[file_format](stream, columns, rows)
+    partial.replace(path)
+    return count
@@ -0,0 +1,35 @@
+import unicodedata
+
+from django.db import models
+
+
+def casefold(value):
+    """Return Unicode-aware caseless form of value for search."""
+    if value is None:
+        return ''
+    return unicodedata.normalize('NFKC', value).casefold()
+
+
+class CaseFoldedCharField(models.CharField):
+    """
+    Casefolded copy of `source` field, refreshed on every save and
+    bulk_create. Rows changed with QuerySet.update() are not synced.
+    It is matched by substring, which a B-tree index can't serve, so
+    the column is not indexed.
+    """
+
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('default', '')
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = casefold(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
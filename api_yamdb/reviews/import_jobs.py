@@ -0,0 +1,124 @@
+import logging
+import queue
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from reviews.management.commands.import_csv import Command as ImportCommand
+from reviews.models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+def run_import_job(job_id):
+    """
+    Import file of the job with import_csv, committing every batch, so
+    progress is visible from its checkpoint while the import runs.
+    """
+    job = ImportJob.objects.get(pk=job_id)
+    ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.RUNNING)
+    report_name = f'{job.file.name}.rejected.csv'
+    report_path = Path(job.file.storage.path(report_name))
+    command = ImportCommand()
+    out = StringIO()
+    fields = {'status': ImportJob.DONE}
+    try:
+        call_command(
+            command, f'{job.filename}={job.file.path}',
+            batch_size=settings.IMPORT_JOB_BATCH_SIZE, report=report_path,
+            upsert=job.upsert, resume=True, verbosity=0,
+            stdout=out, stderr=out
+        )
+    except Exception as error:
+        fields = {'status': ImportJob.FAILED}
+        out.write(f'\n{error}')
+    for results in command.results.values():
+        fields.update(results)
+    if fields.get('rejected'):
+        fields['report'] = report_name
+    else:
+        report_path.unlink(missing_ok=True)
+    ImportJob.objects.filter(pk=job.pk).update(
+        log=out.getvalue().strip(), finished_at=timezone.now(), **fields
+    )
+
+
+class ImportJobWorker:
+    """
+    Daemon thread running import jobs one by one in the order they were
+    queued, so admin requests only store the upload and return. Another
+    thread records heartbeats of the queued and running jobs, so jobs
+    lost with the process are seen as interrupted and can be restarted.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.jobs = set()
+        self.thread = None
+        self.heartbeat = None
+        self.lock = threading.Lock()
+
+    def enqueue(self, job_id):
+        ImportJob.objects.filter(pk=job_id).update(
+            heartbeat_at=timezone.now()
+        )
+        with self.lock:
+            self.jobs.add(job_id)
+            self.queue.put(job_id)
+            self.thread = self._start(self.thread, self._run, 'import-jobs')
+            self.heartbeat = self._start(
+                self.heartbeat, self._beat, 'import-jobs-heartbeat'
+            )
+
+    def join(self):
+        """Wait until all queued jobs are finished."""
+        self.queue.join()
+
+    @staticmethod
+    def _start(thread, target, name):
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+        return thread
+
+    def _run(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                run_import_job(job_id)
+            except Exception:
+                # keep the thread for the next jobs
+                logger.exception('Import job %s failed', job_id)
+            finally:
+                connection.close()
+                with self.lock:
+                    self.jobs.discard(job_id)
+                self.queue.task_done()
+
+    def touch(self):
+        """Record heartbeats of the queued and running jobs."""
+        with self.lock:
+            job_ids = list(self.jobs)
+        if job_ids:
+            ImportJob.objects.filter(pk__in=job_ids).update(
+                heartbeat_at=timezone.now()
+            )
+
+    def _beat(self):
+        while True:
+            time.sleep(settings.IMPORT_JOB_HEARTBEAT_INTERVAL)
+            try:
+                self.touch()
+            except Exception:
+                logger.exception('Import job heartbeat failed')
+            finally:
+                connection.close()
+
+
+import_jobs = ImportJobWorker()
@@ -0,0 +1,746 @@
+import codecs
+import csv
+import gzip
+import hashlib
+import io
+import json
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from itertools import chain
+from pathlib import Path
+
+from django.apps import apps
+from django.core.exceptions import (NON_FIELD_ERRORS, FieldDoesNotExist,
+                                    ValidationError)
+from django.db import connection
+from django.db.models import UniqueConstraint
+
+from reviews.fields import CaseFoldedCharField
+from reviews.signals import bulk_created, bulk_updated
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+HASH_CHUNK_SIZE = 2 ** 20
+
+JSON_CHUNK_SIZE = 2 ** 16
+
+# longest json array element, in characters, kept in the parse buffer
+JSON_MAX_ROW_SIZE = 2 ** 24
+
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+@contextmanager
+def open_source(path):
+    """Open file, or stdin for '-', as bytes, unpacking gzip if needed."""
+    raw = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    if not hasattr(raw, 'peek'):
+        raw = io.BufferedReader(raw)
+    stream = raw
+    if raw.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=raw)
+    try:
+        yield stream
+    finally:
+        if path != '-':
+            stream.close()
+            raw.close()
+
+
+def file_digest(path):
+    """Return SHA-256 of file content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseError(Exception):
+    """
+    Unreadable source data. Failures of parse workers are passed to
+    the writer through queue as well.
+    """
+
+
+class CsvReader:
+    """
+    Iterator over csv rows as dicts keyed by header names. Keeps byte
+    offset of the next row, so reading can be continued from it.
+    """
+
+    def __init__(self, stream, offset=0):
+        self.stream = stream
+        self.offset = 0
+        self.fieldnames = next(csv.reader(self._lines()), [])
+        if offset:
+            stream.seek(offset)
+            self.offset = offset
+        self.reader = csv.reader(self._lines())
+
+    def _lines(self):
+        for line in self.stream:
+            self.offset += len(line)
+            yield line.decode('utf-8')
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self.reader)
+        while not row:
+            row = next(self.reader)
+        return dict(zip(self.fieldnames, row))
+
+
+class NdjsonReader:
+    """
+    Iterator over objects of newline delimited json, one per line.
+    Keeps byte offset of the next line like CsvReader.
+    """
+
+    def __init__(self, stream, offset=0):
+        self.stream = stream
+        self.offset = offset
+        if offset:
+            stream.seek(offset)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for line in self.stream:
+            self.offset += len(line)
+            if line.strip():
+                return parse_json_row(line)
+        raise StopIteration
+
+
+class JsonArrayReader:
+    """
+    Iterator over objects of a json array, decoded one by one from a
+    buffer refilled with chunks of the stream, so the whole document is
+    never held in memory. Keeps byte offset after the last object.
+    """
+
+    def __init__(self, stream, offset=0):
+        self.stream = stream
+        self.offset = offset
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        # reading continued from offset starts right after an object
+        self.started = bool(offset)
+        self.finished = False
+        if offset:
+            stream.seek(offset)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.finished:
+            raise StopIteration
+        char = self._peek()
+        if not self.started:
+            if char != '[':
+                raise ParseError('json array expected')
+            self._advance(1)
+            self.started = True
+            char = self._peek()
+            if char == ']':
+                return self._finish()
+        elif char == ']':
+            return self._finish()
+        elif char == ',':
+            self._advance(1)
+        else:
+            raise ParseError(
+                'unexpected end of json array' if not char
+                else f'"," or "]" expected, got "{char}"'
+            )
+        return self._decode()
+
+    def _finish(self):
+        self._advance(1)
+        self.finished = True
+        raise StopIteration
+
+    def _fill(self):
+        """Append next chunk to the buffer, return False at the end."""
+        chunk = self.stream.read(JSON_CHUNK_SIZE)
+        self.buffer = self.buffer[self.position:] + self.text.decode(
+            chunk, final=not chunk
+        )
+        self.position = 0
+        return bool(chunk)
+
+    def _advance(self, length):
+        end = self.position + length
+        self.offset += len(self.buffer[self.position:end].encode('utf-8'))
+        self.position = end
+
+    def _peek(self):
+        """Skip whitespace and return the next character, '' at the end."""
+        while True:
+            end = JSON_WHITESPACE.match(self.buffer, self.position).end()
+            self._advance(end - self.position)
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ''
+
+    def _decode(self):
+        if not self._peek():
+            raise ParseError('unexpected end of json array')
+        while True:
+            try:
+                row, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                if (len(self.buffer) - self.position < JSON_MAX_ROW_SIZE
+                        and self._fill()):
+                    continue
+                raise ParseError(f'invalid json: {error}')
+            # a number at the end of the buffer may continue in next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self._advance(end - self.position)
+            return check_json_row(row)
+
+
+def parse_json_row(text):
+    """Return object decoded from a line of ndjson."""
+    try:
+        row = json.loads(text)
+    except ValueError as error:
+        raise ParseError(f'invalid json: {error}')
+    return check_json_row(row)
+
+
+def check_json_row(row):
+    if not isinstance(row, dict):
+        raise ParseError(f'json object expected, got {type(row).__name__}')
+    return row
+
+
+READERS = {
+    'csv': CsvReader,
+    'ndjson': NdjsonReader,
+    'json': JsonArrayReader,
+}
+
+FORMAT_SUFFIXES = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'json',
+}
+
+
+class Batch(list):
+    """
+    Rows or objects with reader offset after the last of them, numbers
+    of their rows in the file and (number, row, errors) of rejected rows.
+    """
+
+    def __init__(self, items=(), offset=None, numbers=None, rejected=None):
+        super().__init__(items)
+        self.offset = offset
+        self.numbers = [] if numbers is None else numbers
+        self.rejected = [] if rejected is None else rejected
+
+
+def peek_columns(batches):
+    """Return column names of the first row and all batches of rows."""
+    first = next(batches, None)
+    if first is None:
+        return [], iter(())
+    if first:
+        row = first[0]
+    elif first.rejected:
+        row = first.rejected[0][1]
+    else:
+        row = {}
+    return list(row), chain([first], batches)
+
+
+def get_converter(field):
+    """Return function turning text value into python value of field."""
+    def convert(value):
+        if value == '' and field.null:
+            return None
+        return field.to_python(value)
+    return convert
+
+
+def convert_row(model, row, converters):
+    """Return row with values converted to field types and their errors."""
+    values, errors = {}, {}
+    for name, value in row.items():
+        if name not in converters:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ParseError(f'unknown column "{name}"')
+            converters[name] = get_converter(field)
+        try:
+            values[name] = converters[name](value)
+        except ValidationError as error:
+            errors[name] = error.messages
+    return values, errors
+
+
+def build_objects(model, batches):
+    """Yield batches of model instances made of batches of rows."""
+    for batch in batches:
+        yield Batch(
+            (model(**values) for values in batch),
+            offset=batch.offset, rejected=batch.rejected
+        )
+
+
+def detect_format(path):
+    """Return format of file by its extension, csv if it is unknown."""
+    suffixes = [
+        suffix.lower() for suffix in Path(str(path)).suffixes
+        if suffix.lower() != '.gz'
+    ]
+    return FORMAT_SUFFIXES.get(suffixes[-1] if suffixes else '', 'csv')
+
+
+def get_table_name(filename):
+    """Return file name without extensions: review.ndjson.gz -> review."""
+    return Path(filename).name.split('.')[0]
+
+
+def read_batches(model, path, batch_size, offset=0, start=1,
+                 file_format='csv'):
+    """
+    Yield batches of converted rows of a file, starting at offset with
+    row number start. Rows with unconvertible values are rejected.
+    """
+    with open_source(path) as stream:
+        reader = READERS[file_format](stream, offset)
+        converters = {}
+        # batched yields as soon as a batch is full, so reader offset
+        # points right after its last row
+        for rows in batched(enumerate(reader, start), batch_size):
+            batch = Batch(offset=reader.offset)
+            for number, row in rows:
+                values, errors = convert_row(model, row, converters)
+                if errors:
+                    batch.rejected.append((number, row, errors))
+                else:
+                    batch.append(values)
+                    batch.numbers.append(number)
+            yield batch
+
+
+def get_unique_sets(model):
+    """Return tuples of names of fields having unique values together."""
+    opts = model._meta
+    unique_sets = [
+        (field.name,) for field in opts.concrete_fields if field.unique
+    ]
+    unique_sets.extend(tuple(names) for names in opts.unique_together)
+    unique_sets.extend(
+        tuple(constraint.fields) for constraint in opts.constraints
+        if isinstance(constraint, UniqueConstraint)
+        and constraint.condition is None
+    )
+    return unique_sets
+
+
+class BatchValidator:
+    """
+    Validates batches of converted rows column by column instead of
+    calling full_clean() for every row: each distinct value of a column
+    is validated once per batch, foreign keys and unique values are
+    looked up in key sets loaded from the database once per table.
+    With upsert key, rows may repeat unique values of rows they update.
+    Checks of a column are skipped for json rows which do not have it.
+    """
+
+    def __init__(self, model, columns, key=None):
+        self.model = model
+        self.key = key and model._meta.get_field(key).attname
+        self.foreign_keys = {}
+        self.unique_values = {}
+        self._set_columns(columns)
+
+    def _set_columns(self, columns):
+        self.fields = {
+            column: self.model._meta.get_field(column) for column in columns
+        }
+        columns_by_name = {
+            field.name: column for column, field in self.fields.items()
+        }
+        self.unique_checks = [
+            tuple(columns_by_name[name] for name in names)
+            for names in self._get_unique_sets()
+            if all(name in columns_by_name for name in names)
+        ]
+
+    def _get_unique_sets(self):
+        return get_unique_sets(self.model)
+
+    def validate(self, batches):
+        """Yield batches with invalid rows moved to rejected."""
+        for batch in batches:
+            columns = set(self.fields)
+            for row in batch:
+                columns.update(row)
+            if len(columns) > len(self.fields):
+                self._set_columns([*self.fields, *columns - set(self.fields)])
+            errors = [{} for _ in batch]
+            for column, field in self.fields.items():
+                if field.is_relation:
+                    self._check_foreign_keys(batch, column, field, errors)
+                else:
+                    self._check_values(batch, column, field, errors)
+            self._check_unique(batch, errors)
+            valid = Batch(offset=batch.offset, rejected=list(batch.rejected))
+            for number, values, row_errors in zip(
+                batch.numbers, batch, errors
+            ):
+                if row_errors:
+                    valid.rejected.append((number, values, row_errors))
+                else:
+                    valid.append(values)
+            valid.rejected.sort(key=lambda rejected: rejected[0])
+            yield valid
+
+    def _check_values(self, rows, column, field, errors):
+        checked = {}
+        for row, row_errors in zip(rows, errors):
+            if column not in row:
+                continue
+            value = row[column]
+            if value not in checked:
+                checked[value] = get_value_errors(field, value)
+            if checked[value]:
+                row_errors[column] = checked[value]
+
+    def _check_foreign_keys(self, rows, column, field, errors):
+        if field not in self.foreign_keys:
+            self.foreign_keys[field] = set(
+                field.related_model._default_manager.values_list(
+                    field.target_field.attname, flat=True
+                )
+            )
+        keys = self.foreign_keys[field]
+        for row, row_errors in zip(rows, errors):
+            if column not in row:
+                continue
+            value = row[column]
+            if value is None:
+                if not field.null:
+                    row_errors[column] = [field.error_messages['null']]
+            elif value not in keys:
+                row_errors[column] = ValidationError(
+                    field.error_messages['invalid'],
+                    params={
+                        'model': field.related_model._meta.verbose_name,
+                        'pk': value,
+                        'field': field.remote_field.field_name,
+                        'value': value,
+                    }
+                ).messages
+
+    def _get_unique_values(self, columns):
+        if columns not in self.unique_values:
+            attnames = [self.fields[column].attname for column in columns]
+            owner = self.key or self.model._meta.pk.attname
+            self.unique_values[columns] = {
+                tuple(values[:-1]): values[-1]
+                for values in self.model._default_manager.values_list(
+                    *attnames, owner
+                )
+            }
+        return self.unique_values[columns]
+
+    def _check_unique(self, rows, errors):
+        # rows are checked one by one, so duplicates inside the file
+        # are caught by values of rows accepted before them
+        for row, row_errors in zip(rows, errors):
+            if row_errors:
+                continue
+            owner = row.get(self.key) if self.key else None
+            found = []
+            for columns in self.unique_checks:
+                values = tuple(row.get(column) for column in columns)
+                if None in values:
+                    continue
+                existing = self._get_unique_values(columns)
+                if values in existing and (
+                    self.key is None or existing[values] != owner
+                ):
+                    field = columns[0] if len(columns) == 1 else (
+                        NON_FIELD_ERRORS
+                    )
+                    row_errors[field] = self.model().unique_error_message(
+                        self.model, [self.fields[c].name for c in columns]
+                    ).messages
+                found.append((existing, values))
+            if not row_errors:
+                for existing, values in found:
+                    existing[values] = owner
+
+
+def get_value_errors(field, value):
+    """
+    Return messages of field validation errors of value, if any. Empty
+    strings are accepted like the database does, "blank" is a form rule.
+    """
+    if value is None:
+        return None if field.null else [field.error_messages['null']]
+    if value in field.empty_values:
+        return None
+    try:
+        field.validate(value, None)
+        field.run_validators(value)
+    except ValidationError as error:
+        return error.messages
+    return None
+
+
+class RejectedRowsReport:
+    """Csv report of rejected rows, shared by writer threads."""
+
+    header = ('file', 'row', 'errors', 'values')
+
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(self.header)
+        self.lock = threading.Lock()
+
+    def write(self, filename, rejected):
+        with self.lock:
+            for number, values, errors in rejected:
+                self.writer.writerow((
+                    filename,
+                    number,
+                    '; '.join(
+                        f'{field}: {" ".join(messages)}'
+                        for field, messages in errors.items()
+                    ),
+                    json.dumps(values, ensure_ascii=False, default=str),
+                ))
+
+
+def parse_source(label, path, batch_size, offset, start, file_format,
+                 queue):
+    """
+    Parse file in a worker process, putting batches of converted rows
+    to queue, then None when done.
+    """
+    try:
+        model = apps.get_model(label)
+        for batch in read_batches(model, path, batch_size, offset, start,
+                                  file_format):
+            queue.put(batch)
+    except Exception as error:
+        queue.put(ParseError(f'{path}: {error}'))
+    else:
+        queue.put(None)
+
+
+def iter_queue(queue):
+    """Yield batches put to queue by parse_source."""
+    while True:
+        batch = queue.get()
+        if batch is None:
+            return
+        if isinstance(batch, ParseError):
+            raise batch
+        yield batch
+
+
+def get_dependencies(models):
+    """Map every model to given models it references by foreign keys."""
+    return {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.is_relation
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+
+
+def batched(items, size):
+    """
+    Yield lists of up to size items. Import stages are generators
+    pulling from each other, so only one batch is held in memory.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fill_primary_keys(model, objects):
+    """
+    Set primary keys of inserted objects, which bulk_create leaves empty
+    on databases not returning ids, such as SQLite. There the batch
+    transaction holds the database write lock since the insert, so
+    the newest rows are the inserted ones. Elsewhere rows are looked up
+    by the first unique field, or set of fields, filled in all objects.
+    """
+    missing = [obj for obj in objects if obj.pk is None]
+    if not missing:
+        return
+    if len(missing) == len(objects) and connection.vendor == 'sqlite':
+        pks = model._default_manager.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(objects)]
+        for obj, pk in zip(objects, reversed(pks)):
+            obj.pk = pk
+        return
+    for names in get_unique_sets(model):
+        attnames = [model._meta.get_field(name).attname for name in names]
+        by_key = {
+            tuple(getattr(obj, attname) for attname in attnames): obj
+            for obj in missing
+        }
+        if any(None in key for key in by_key):
+            continue
+        for keys in batched(by_key, 500):
+            rows = model._default_manager.filter(**{
+                f'{attnames[0]}__in': {key[0] for key in keys}
+            }).values_list(*attnames, 'pk')
+            for *key, pk in rows:
+                obj = by_key.get(tuple(key))
+                if obj is not None:
+                    obj.pk = pk
+        return
+    raise ParseError(
+        f'{model.__name__} rows need an id column on this database'
+    )
+
+
+def insert_objects(model, objects):
+    """
+    Insert objects with bulk_create and set their primary keys, keeping
+    given values of auto_now_add fields, such as review dates, which
+    bulk_create replaces with the current time. Values are restored by
+    bulk_update of objects with ids.
+    """
+    stamps = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    given = [
+        (obj, [getattr(obj, field.attname) for field in stamps])
+        for obj in objects
+        if any(getattr(obj, field.attname) is not None for field in stamps)
+    ]
+    model.objects.bulk_create(objects)
+    fill_primary_keys(model, objects)
+    given = [(obj, values) for obj, values in given if obj.pk is not None]
+    if not given:
+        return
+    for obj, values in given:
+        for field, value in zip(stamps, values):
+            if value is not None:
+                setattr(obj, field.attname, value)
+    model.objects.bulk_update(
+        [obj for obj, _ in given], [field.name for field in stamps]
+    )
+
+
+def write_batches(model, batches):
+    """
+    Insert every batch with bulk_create, yield the batch with created
+    objects and (previous, updated) pairs of updated ones.
+    """
+    for batch in batches:
+        insert_objects(model, batch)
+        # bulk_create does not send post_save
+        bulk_created.send(sender=model, instances=batch)
+        yield batch, list(batch), []
+
+
+def get_upsert_fields(model, key, columns):
+    """
+    Return fields compared with existing rows and fields refreshed on
+    update, which bulk_update does not fill by itself.
+    """
+    compared = []
+    for column in columns:
+        field = model._meta.get_field(column)
+        if field.primary_key or field.name == key:
+            continue
+        if getattr(field, 'auto_now', False):
+            continue
+        if getattr(field, 'auto_now_add', False):
+            continue
+        compared.append(field)
+    compared_names = {field.name for field in compared}
+    derived = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or (isinstance(field, CaseFoldedCharField)
+            and field.source in compared_names)
+    ]
+    return compared, derived
+
+
+def upsert_batches(model, batches, key, columns):
+    """
+    Insert new objects and update changed ones, matching them with
+    existing rows by key field. Unchanged rows are not written.
+    Yield every batch with created objects and (previous, updated)
+    pairs of updated ones.
+    """
+    key_attname = model._meta.get_field(key).attname
+    compared, derived = get_upsert_fields(model, key, columns)
+    update_fields = [field.name for field in compared + derived]
+    for batch in batches:
+        existing = model.objects.in_bulk(
+            {getattr(obj, key_attname) for obj in batch}, field_name=key
+        )
+        created, changed = [], []
+        for obj in batch:
+            current = existing.get(getattr(obj, key_attname))
+            if current is None:
+                created.append(obj)
+                continue
+            if all(
+                getattr(obj, field.attname) == getattr(current, field.attname)
+                for field in compared
+            ):
+                continue
+            obj.pk = current.pk
+            for field in derived:
+                field.pre_save(obj, False)
+            changed.append((current, obj))
+        insert_objects(model, created)
+        bulk_created.send(sender=model, instances=created)
+        if changed and update_fields:
+            updated = [obj for _, obj in changed]
+            model.objects.bulk_update(updated, update_fields)
+            bulk_updated.send(sender=model, instances=updated)
+        yield batch, created, changed
+
+
+def peak_memory():
+    """Return peak resident memory of the process in bytes, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -4,12 +4,13 @@ from reviews.models import Category, Comment, Genre, Review, Title
 
 User = get_user_model()
 
+# rows without id column are matched by natural_key in upsert mode
 csv_data_relation = (
-    {'model': Category, 'filename': 'category.csv'},
-    {'model': Genre, 'filename': 'genre.csv'},
+    {'model': Category, 'filename': 'category.csv', 'natural_key': 'slug'},
+    {'model': Genre, 'filename': 'genre.csv', 'natural_key': 'slug'},
     {'model': Title, 'filename': 'titles.csv'},
     {'model': Title.genre.through, 'filename': 'genre_title.csv'},
-    {'model': User, 'filename': 'users.csv'},
+    {'model': User, 'filename': 'users.csv', 'natural_key': 'username'},
     {'model': Review, 'filename': 'review.csv'},
     {'model': Comment, 'filename': 'comments.csv'}
 )
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from reviews.exporter import WRITERS, export_table
+from reviews.importer import get_table_name
+from ._csv_data_relations import csv_data_relation
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports tables imported by import_csv to csv or ndjson files, '
+        'which import_csv reads back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables',
+            nargs='*',
+            metavar='FILENAME',
+            help='Export only these files, named like in import_csv'
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=Path('.'),
+            type=Path,
+            help='Directory for exported files, created if missing'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(WRITERS),
+            default='csv',
+            help='Format of exported files'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress files with gzip (*.csv.gz)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of rows fetched from the database at once'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes exporting tables concurrently'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if kwargs['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        output_dir = kwargs['output_dir']
+        output_dir.mkdir(parents=True, exist_ok=True)
+        suffix = f'.{kwargs["format"]}' + ('.gz' if kwargs['gzip'] else '')
+        tasks = [
+            (
+                csv_pair['model']._meta.label,
+                output_dir / f'{get_table_name(csv_pair["filename"])}{suffix}',
+                kwargs['format'], kwargs['gzip'], kwargs['chunk_size']
+            )
+            for csv_pair in self._get_relations(kwargs['tables'])
+        ]
+        started = time.monotonic()
+        if kwargs['workers'] > 1:
+            # processes must open their own connections instead of
+            # sharing the inherited ones
+            connections.close_all()
+            with ProcessPoolExecutor(
+                kwargs['workers'], initializer=django.setup
+            ) as pool:
+                futures = [pool.submit(export_table, *task) for task in tasks]
+                counts = [future.result() for future in futures]
+        else:
+            counts = [export_table(*task) for task in tasks]
+        for (_, path, *_), count in zip(tasks, counts):
+            self.stdout.write(
+                f'{path.name}: {count} rows, '
+                f'{path.stat().st_size / 2 ** 20:.2f} MB'
+            )
+        elapsed = time.monotonic() - started
+        rate = sum(counts) / elapsed if elapsed else float('inf')
+        self.stdout.write(
+            f'Exported {sum(counts)} rows in {elapsed:.2f} s '
+            f'({rate:.0f} rows/s)'
+        )
+
+    def _get_relations(self, tables):
+        """Return entries of csv_data_relation for given file names."""
+        if not tables:
+            return csv_data_relation
+        names = {get_table_name(table) for table in tables}
+        relations = [
+            csv_pair for csv_pair in csv_data_relation
+            if get_table_name(csv_pair['filename']) in names
+        ]
+        unknown = names - {
+            get_table_name(csv_pair['filename']) for csv_pair in relations
+        }
+        if unknown:
+            raise CommandError(
+                f'Unknown files: {", ".join(sorted(unknown))}, '
+                'expected some of: '
+                f'{", ".join(pair["filename"] for pair in csv_data_relation)}'
+            )
+        return relations
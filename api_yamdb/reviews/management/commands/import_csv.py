@@ -1,49 +1,510 @@
-import csv
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, nullcontext
+from multiprocessing import Manager
 from pathlib import Path
 
+import django
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
 
 from tqdm import tqdm
 
+from reviews.importer import (FORMAT_SUFFIXES, READERS, BatchValidator,
+                              ParseError, RejectedRowsReport, batched,
+                              build_objects, detect_format, file_digest,
+                              get_dependencies, get_table_name, iter_queue,
+                              parse_source, peak_memory, peek_columns,
+                              read_batches, upsert_batches, write_batches)
+from reviews.models import (GenreFacet, ImportCheckpoint, ImportedFile,
+                            Review, Title, TitleFacet)
+from reviews.signals import rating_changed
 from ._csv_data_relations import csv_data_relation
 
+# batches parsed ahead of the writer of every table in parallel mode
+PARSE_QUEUE_SIZE = 4
+
 
 class Command(BaseCommand):
-    help = 'Imports csv data from files in staic/data/ into database'
+    help = (
+        'Imports csv, ndjson or json data from files in static/data/ '
+        'into database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sources',
+            nargs='*',
+            metavar='FILENAME[=PATH]',
+            help=(
+                'Import only these files of the data directory, '
+                'PATH replaces the file, "-" reads it from stdin'
+            )
+        )
+        parser.add_argument(
+            '--data-dir',
+            default=Path(settings.BASE_DIR) / 'static' / 'data',
+            type=Path,
+            help=(
+                'Directory with csv, ndjson (*.ndjson, *.jsonl) or json '
+                'array files, which may be gzipped (*.csv.gz)'
+            )
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help=(
+                'Format of all files, detected by file extensions '
+                'by default, csv for stdin'
+            )
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows inserted by one INSERT statement'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help=(
+                'Number of processes parsing files, tables without '
+                'mutual foreign keys are written concurrently'
+            )
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help=(
+                'Continue files from checkpoints of the last committed '
+                'batches and skip completely imported files'
+            )
+        )
+        parser.add_argument(
+            '--report',
+            type=Path,
+            help=(
+                'Csv file listing rows rejected by validation with '
+                'their errors'
+            )
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help=(
+                'Update existing rows matched by id, slug or username '
+                'and skip files not changed since the last import'
+            )
+        )
 
     def handle(self, *args, **kwargs):
-        objects = self._create_list_of_model_objects(csv_data_relation)
-        for obj_list in objects:
-            table_name = type(obj_list[0]).__name__
-            self.stdout.write(f'\nSaving data to table "{table_name}":')
-            for obj in tqdm(obj_list):
-                obj.save()
-
-    def _create_model_objects_from_csv_data(self, csv_file, model):
-        """Returns list of model objects, populated from csv_file data."""
-        model_objects = []
-        with open(csv_file, newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                model_object = model(**row)
-                model_objects.append(model_object)
-        return model_objects
-
-    def _create_list_of_model_objects(self, csv_data_relation):
-        """Create a list of model object lists."""
-        model_objects_list = []
-        csv_dir = Path(settings.BASE_DIR) / 'static' / 'data'
+        self.batch_size = kwargs['batch_size']
+        self.upsert = kwargs['upsert']
+        self.resume = kwargs['resume']
+        self.format = kwargs['format']
+        self.verbosity = kwargs['verbosity']
+        # numbers of rows of every imported table, read by import jobs
+        self.results = {}
+        # titles and years whose stored ratings and facets rows changed
+        self.rated_titles = set()
+        self.facet_titles = set()
+        self.facet_years = set()
+        # set when resuming after a run, whose changes are unknown
+        self.recount_all = False
+        self.changes_lock = threading.Lock()
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        if kwargs['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        sources = self._get_sources(kwargs['sources'], kwargs['data_dir'])
+        # SQLite allows one writing transaction at a time
+        self.write_lock = (
+            threading.Lock() if connection.vendor == 'sqlite'
+            else nullcontext()
+        )
+        self.rejected = []
+        try:
+            with ExitStack() as stack:
+                self.report = None
+                if kwargs['report']:
+                    self.report = RejectedRowsReport(stack.enter_context(
+                        open(kwargs['report'], 'w', newline='',
+                             encoding='utf-8')
+                    ))
+                if kwargs['workers'] > 1:
+                    imported = self._import_parallel(
+                        sources, kwargs['workers']
+                    )
+                else:
+                    imported = self._import_sequential(sources)
+        finally:
+            # batches committed before an error stay in the database
+            self._recount_derived_data()
+        if imported:
+            self._reset_sequences(imported)
+        if sum(self.rejected) and self.report is None:
+            self.stdout.write(
+                f'\n{sum(self.rejected)} rows rejected, '
+                'use --report to list them with errors'
+            )
+        peak = peak_memory()
+        if peak is not None:
+            self.stdout.write(f'\nPeak memory: {peak / 2 ** 20:.1f} MB')
+
+    def _import_sequential(self, sources):
+        """Import files one by one in the order of csv_data_relation."""
+        digests = [
+            None if path == '-' else file_digest(path) for _, path in sources
+        ]
+        tasks = self._plan(sources, digests)
+        for csv_pair, path, digest, checkpoint in tasks:
+            batches = read_batches(
+                csv_pair['model'], path, self.batch_size,
+                *self._get_position(checkpoint), self._get_format(path)
+            )
+            self._import_table(csv_pair, batches, digest, checkpoint)
+        return [csv_pair['model'] for csv_pair, _, _, _ in tasks]
+
+    def _import_parallel(self, sources, workers):
+        """
+        Parse files in a process pool and write every table in its own
+        thread, started when tables it references are written.
+        """
+        with ProcessPoolExecutor(workers, initializer=django.setup) as pool, \
+                Manager() as manager:
+            digests = iter(pool.map(file_digest, [
+                path for _, path in sources if path != '-'
+            ]))
+            tasks = self._plan(sources, [
+                None if path == '-' else next(digests) for _, path in sources
+            ])
+            models = [csv_pair['model'] for csv_pair, _, _, _ in tasks]
+            dependencies = get_dependencies(models)
+            done = {model: threading.Event() for model in models}
+            errors = []
+            writers = []
+            # parse jobs are queued in dependency order, so the pool
+            # always runs a job whose writer can proceed
+            for csv_pair, path, digest, checkpoint in tasks:
+                model = csv_pair['model']
+                file_format = self._get_format(path)
+                if path == '-':
+                    batches = read_batches(model, path, self.batch_size,
+                                           file_format=file_format)
+                else:
+                    queue = manager.Queue(PARSE_QUEUE_SIZE)
+                    pool.submit(parse_source, model._meta.label, str(path),
+                                self.batch_size,
+                                *self._get_position(checkpoint),
+                                file_format, queue)
+                    batches = iter_queue(queue)
+                    if not isinstance(self.write_lock, nullcontext):
+                        batches = self._wait_unlocked(batches)
+                writers.append(threading.Thread(
+                    target=self._write_table,
+                    args=(csv_pair, batches, digest, checkpoint,
+                          [done[dependency]
+                           for dependency in dependencies[model]],
+                          done[model], errors)
+                ))
+            for writer in writers:
+                writer.start()
+            for writer in writers:
+                writer.join()
+        if errors:
+            raise errors[0]
+        return models
+
+    def _wait_unlocked(self, batches):
+        """
+        Yield batches of a parse queue, releasing the write lock while
+        waiting for each of them. Otherwise a writer holding the lock
+        could wait for a parse job that has no free worker, while the
+        workers wait for writers blocked on the lock.
+        """
+        batches = iter(batches)
+        while True:
+            self.write_lock.release()
+            try:
+                batch = next(batches, None)
+            finally:
+                self.write_lock.acquire()
+            if batch is None:
+                return
+            yield batch
+
+    def _write_table(self, csv_pair, batches, digest, checkpoint,
+                     dependencies, done, errors):
+        """Writer thread of one table in parallel mode."""
+        try:
+            for dependency in dependencies:
+                dependency.wait()
+            if not errors:
+                self._import_table(csv_pair, batches, digest, checkpoint)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            done.set()
+            connection.close()
+
+    def _plan(self, sources, digests):
+        """
+        Return (csv_pair, path, digest, checkpoint) of files to import,
+        leaving out files imported before when upserting or resuming.
+        """
+        tasks = []
+        for (csv_pair, path), digest in zip(sources, digests):
+            filename = csv_pair['filename']
+            if (self.upsert or self.resume) and ImportedFile.objects.filter(
+                filename=filename, sha256=digest
+            ).exists():
+                # the run importing it may have stopped before recounting
+                self.recount_all = self.recount_all or self.resume
+                self.stdout.write(
+                    f'\nSkipping "{filename}": '
+                    'not changed since the last import'
+                )
+                continue
+            checkpoint = None
+            if self.resume:
+                checkpoint = ImportCheckpoint.objects.filter(
+                    filename=filename, sha256=digest
+                ).first()
+            if checkpoint:
+                self.recount_all = True
+                self.stdout.write(
+                    f'\nResuming "{filename}" after {checkpoint.rows} '
+                    f'rows in {checkpoint.batches} batches'
+                )
+            tasks.append((csv_pair, path, digest, checkpoint))
+        return tasks
+
+    def _get_position(self, checkpoint):
+        """Return byte offset and number of the first row to read."""
+        if checkpoint is None:
+            return 0, 1
+        return checkpoint.offset, checkpoint.rows + 1
+
+    def _get_format(self, path):
+        if self.format:
+            return self.format
+        return 'csv' if path == '-' else detect_format(path)
+
+    def _get_sources(self, arguments, data_dir):
+        """
+        Return (csv_pair, path) for files to import in FK order. Files
+        are named after csv files, any supported extension may be used.
+        """
+        known = {
+            get_table_name(pair['filename']): pair['filename']
+            for pair in csv_data_relation
+        }
+        paths = {}
+        unknown = []
+        for argument in arguments:
+            name, _, path = argument.partition('=')
+            filename = known.get(get_table_name(name))
+            if filename is None:
+                unknown.append(name)
+            paths[filename] = path or None
+        if unknown:
+            raise CommandError(
+                f'Unknown files: {", ".join(sorted(unknown))}, '
+                f'expected some of: {", ".join(sorted(known.values()))}'
+            )
+        if list(paths.values()).count('-') > 1:
+            raise CommandError('Only one file can be read from stdin')
+        sources = []
         for csv_pair in csv_data_relation:
-            csv_file = csv_dir / csv_pair['filename']
-            model = csv_pair['model']
-            if not csv_file.exists():
+            filename = csv_pair['filename']
+            if paths and filename not in paths:
+                continue
+            path = paths.get(filename) or self._find_file(data_dir, filename)
+            if path != '-' and not Path(path).exists():
                 raise CommandError(
-                    f'File {csv_file} not found!'
+                    f'File {path} not found!'
                 )
-            model_objects = self._create_model_objects_from_csv_data(
-                csv_file,
-                model
+            sources.append((csv_pair, path))
+        return sources
+
+    def _find_file(self, data_dir, filename):
+        """Return file of a table in the first found format."""
+        table_name = get_table_name(filename)
+        for suffix in FORMAT_SUFFIXES:
+            for name in (f'{table_name}{suffix}.gz', f'{table_name}{suffix}'):
+                if (data_dir / name).exists():
+                    return data_dir / name
+        return data_dir / filename
+
+    def _import_table(self, csv_pair, batches, digest, checkpoint=None):
+        """
+        Write batches of one table to the database, committing every
+        batch together with a checkpoint of its file position.
+        """
+        model = csv_pair['model']
+        table_name = model.__name__
+        self.stdout.write(f'\nSaving data to table "{table_name}":')
+        started = time.monotonic()
+        rows = created = updated = rejected = 0
+        done_batches = checkpoint.batches if checkpoint else 0
+        done_rows = checkpoint.rows if checkpoint else 0
+        try:
+            with self.write_lock, tqdm(desc=table_name, unit=' rows',
+                                       disable=self.verbosity < 1) as progress:
+                pipeline = self._build_pipeline(csv_pair, batches)
+                while True:
+                    with transaction.atomic():
+                        result = next(pipeline, None)
+                        if result is None:
+                            self._finish_file(csv_pair['filename'], digest)
+                            break
+                        batch, batch_created, batch_updated = result
+                        rows += len(batch)
+                        rejected += len(batch.rejected)
+                        created += len(batch_created)
+                        updated += len(batch_updated)
+                        self._collect_changes(
+                            model, batch_created, batch_updated
+                        )
+                        done_batches += 1
+                        if digest is not None:
+                            ImportCheckpoint.objects.update_or_create(
+                                filename=csv_pair['filename'],
+                                defaults={
+                                    'sha256': digest,
+                                    'offset': batch.offset,
+                                    'batches': done_batches,
+                                    'rows': done_rows + rows + rejected,
+                                }
+                            )
+                    if self.report is not None:
+                        self.report.write(csv_pair['filename'], batch.rejected)
+                    progress.update(len(batch) + len(batch.rejected))
+        except IntegrityError as error:
+            raise CommandError(
+                f'Table "{table_name}" import stopped after {rows} rows, '
+                f'next rows conflict with existing data: {error}'
+            )
+        except (ParseError, ValidationError) as error:
+            raise CommandError(
+                f'Table "{table_name}" import stopped after {rows} rows, '
+                f'row {done_rows + rows + rejected + 1} or later is invalid: '
+                f'{error}'
+            )
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else float('inf')
+        self.rejected.append(rejected)
+        self.results[table_name] = {
+            'rows': rows,
+            'created': created,
+            'updated': updated,
+            'rejected': rejected,
+        }
+        self.stdout.write(
+            f'{table_name}: {rows} rows ({created} created, {updated} '
+            f'updated), {rejected} rejected in {elapsed:.2f} s '
+            f'({rate:.0f} rows/s)'
+        )
+
+    def _build_pipeline(self, csv_pair, batches):
+        """
+        Chain validation, object building and writing stages, yielding
+        (batch, created, updated) for every written batch.
+        """
+        model = csv_pair['model']
+        columns, batches = peek_columns(batches)
+        key = self._get_upsert_key(csv_pair, columns) if self.upsert else None
+        batches = BatchValidator(model, columns, key).validate(batches)
+        objects = build_objects(model, batches)
+        if self.upsert:
+            return upsert_batches(model, objects, key, columns)
+        return write_batches(model, objects)
+
+    def _finish_file(self, filename, digest):
+        """Replace checkpoint of a completely imported file by its hash."""
+        ImportCheckpoint.objects.filter(filename=filename).delete()
+        if digest is not None:
+            ImportedFile.objects.update_or_create(
+                filename=filename, defaults={'sha256': digest}
+            )
+
+    def _get_upsert_key(self, csv_pair, columns):
+        """Return field matching rows with existing ones."""
+        key = csv_pair.get('natural_key', 'id')
+        if 'id' in columns or not columns:
+            return 'id'
+        if key not in columns:
+            raise CommandError(
+                f'Table "{csv_pair["model"].__name__}" needs {key} column '
+                'for upsert'
+            )
+        return key
+
+    def _reset_sequences(self, models):
+        """Move primary key sequences past imported ids."""
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def _collect_changes(self, model, created, updated):
+        """
+        Remember titles whose ratings or facet cells are changed by
+        written rows, updated rows are (previous, updated) pairs.
+        """
+        rated, linked, years = set(), set(), set()
+        if model is Review:
+            rated.update(review.title_id for review in created)
+            for previous, review in updated:
+                if (previous.title_id, previous.score) != (
+                    review.title_id, review.score
+                ):
+                    rated.update((previous.title_id, review.title_id))
+        elif model is Title:
+            years.update(title.year for title in created)
+            for previous, title in updated:
+                if (previous.category_id, previous.year) != (
+                    title.category_id, title.year
+                ):
+                    years.update((previous.year, title.year))
+        elif model is Title.genre.through:
+            linked.update(link.title_id for link in created)
+            for previous, link in updated:
+                linked.update((previous.title_id, link.title_id))
+        with self.changes_lock:
+            self.rated_titles.update(rated - {None})
+            self.facet_titles.update(linked - {None})
+            self.facet_years.update(years - {None})
+
+    def _recount_derived_data(self):
+        """
+        Recount ratings and facet counts skipped by bulk writes, only
+        for titles and years touched by the import. Resumed imports
+        recount everything, as batches of the stopped run are unknown.
+        """
+        if self.recount_all:
+            rated_titles = list(
+                Title.objects.order_by('pk').values_list('pk', flat=True)
             )
-            model_objects_list.append(model_objects)
-        return model_objects_list
+        else:
+            rated_titles = sorted(self.rated_titles)
+        for title_ids in batched(rated_titles, self.batch_size):
+            Title.objects.filter(pk__in=title_ids).recalculate_rating()
+            rating_changed.send(sender=Title, title_ids=title_ids)
+        if self.recount_all:
+            TitleFacet.rebuild()
+            GenreFacet.rebuild()
+            return
+        years = set(self.facet_years)
+        for title_ids in batched(sorted(self.facet_titles), self.batch_size):
+            years.update(Title.objects.filter(
+                pk__in=title_ids
+            ).values_list('year', flat=True))
+        if years:
+            TitleFacet.rebuild(years)
+            GenreFacet.rebuild(years)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reviews.models import GenreFacet, TitleFacet
+
+
+class Command(BaseCommand):
+    help = 'Recounts pre-aggregated title facet counts'
+
+    def handle(self, *args, **kwargs):
+        for model in (TitleFacet, GenreFacet):
+            model.rebuild()
+            self.stdout.write(
+                f'{model.__name__}: {model.objects.count()} cells'
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds stored title ratings from reviews in one SQL pass'
+
+    def handle(self, *args, **kwargs):
+        updated = Title.objects.recalculate_rating()
+        self.stdout.write(f'Ratings recalculated for {updated} titles')
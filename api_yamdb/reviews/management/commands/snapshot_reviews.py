@@ -0,0 +1,46 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.snapshots import ReviewSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes reviews, titles and title genres to columnar .npy files '
+        'for analytics, appending reviews created since the last run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            default=Path(settings.REVIEWS_SNAPSHOT_DIR),
+            type=Path,
+            help='Directory of the snapshot'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild the snapshot instead of appending new reviews'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Number of reviews read from the database at once'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        started = time.monotonic()
+        before, after = ReviewSnapshot(kwargs['output_dir']).update(
+            full=kwargs['full'], chunk_size=kwargs['chunk_size']
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Reviews: {after} rows, {after - before} added '
+            f'in {elapsed:.2f} s'
+        )
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:19
+
+from django.db import migrations
+import reviews.fields
+
+
+def fill_name_search(apps, schema_editor):
+    for model_name in ('Category', 'Genre', 'Title'):
+        model = apps.get_model('reviews', model_name)
+        objects = list(model.objects.only('pk', 'name'))
+        for obj in objects:
+            obj.name_search = reviews.fields.casefold(obj.name)
+        model.objects.bulk_update(objects, ['name_search'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='name_search',
+            field=reviews.fields.CaseFoldedCharField(db_index=True, default='', editable=False, max_length=512, source='name', verbose_name='Название для поиска'),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='name_search',
+            field=reviews.fields.CaseFoldedCharField(db_index=True, default='', editable=False, max_length=512, source='name', verbose_name='Название для поиска'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='name_search',
+            field=reviews.fields.CaseFoldedCharField(db_index=True, default='', editable=False, max_length=512, source='name', verbose_name='Название для поиска'),
+        ),
+        migrations.RunPython(fill_name_search, migrations.RunPython.noop),
+    ]
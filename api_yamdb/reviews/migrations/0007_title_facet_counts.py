@@ -0,0 +1,80 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:24
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_facet_counts(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    TitleFacet = apps.get_model('reviews', 'TitleFacet')
+    GenreFacet = apps.get_model('reviews', 'GenreFacet')
+    rows = Title.objects.order_by().values('category', 'year').annotate(
+        total=Count('pk')
+    )
+    TitleFacet.objects.bulk_create([
+        TitleFacet(
+            category_id=row['category'],
+            year=row['year'],
+            titles_count=row['total']
+        )
+        for row in rows
+    ], batch_size=500)
+    rows = Title.genre.through.objects.order_by().values(
+        'genre', 'title__category', 'title__year'
+    ).annotate(total=Count('pk'))
+    GenreFacet.objects.bulk_create([
+        GenreFacet(
+            genre_id=row['genre'],
+            category_id=row['title__category'],
+            year=row['title__year'],
+            titles_count=row['total']
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_modification_stamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleFacet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(verbose_name='Год выпуска')),
+                ('titles_count', models.IntegerField(default=0, verbose_name='Количество произведений')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Количество произведений',
+                'verbose_name_plural': 'Количество произведений',
+            },
+        ),
+        migrations.CreateModel(
+            name='GenreFacet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(verbose_name='Год выпуска')),
+                ('titles_count', models.IntegerField(default=0, verbose_name='Количество произведений')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Category', verbose_name='Категория')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.Genre', verbose_name='Жанр')),
+            ],
+            options={
+                'verbose_name': 'Количество произведений жанра',
+                'verbose_name_plural': 'Количество произведений жанров',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='titlefacet',
+            constraint=models.UniqueConstraint(fields=('category', 'year'), name='unique_title_facet'),
+        ),
+        migrations.AddConstraint(
+            model_name='genrefacet',
+            constraint=models.UniqueConstraint(fields=('genre', 'category', 'year'), name='unique_genre_facet'),
+        ),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_title_facet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=256, unique=True, verbose_name='Имя файла')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 содержимого')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Дата импорта')),
+            ],
+            options={
+                'verbose_name': 'Импортированный файл',
+                'verbose_name_plural': 'Импортированные файлы',
+            },
+        ),
+    ]
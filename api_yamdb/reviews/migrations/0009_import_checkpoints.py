@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_imported_files'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=256, unique=True, verbose_name='Имя файла')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 содержимого')),
+                ('offset', models.BigIntegerField(verbose_name='Смещение в байтах')),
+                ('batches', models.PositiveIntegerField(verbose_name='Записано пачек')),
+                ('rows', models.BigIntegerField(verbose_name='Записано строк')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата записи')),
+            ],
+            options={
+                'verbose_name': 'Точка продолжения импорта',
+                'verbose_name_plural': 'Точки продолжения импорта',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:56
+
+from django.db import migrations, models
+import reviews.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_import_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=256, verbose_name='Таблица')),
+                ('file', models.FileField(help_text='csv, ndjson или json, возможно сжатый gzip', storage=reviews.storage.ImportStorage(), upload_to='uploads/', verbose_name='Файл')),
+                ('upsert', models.BooleanField(default=False, verbose_name='Обновлять существующие строки')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Размер файла в байтах')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершён'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('rows', models.BigIntegerField(default=0, verbose_name='Записано строк')),
+                ('created', models.BigIntegerField(default=0, verbose_name='Добавлено строк')),
+                ('updated', models.BigIntegerField(default=0, verbose_name='Обновлено строк')),
+                ('rejected', models.BigIntegerField(default=0, verbose_name='Отклонено строк')),
+                ('report', models.FileField(blank=True, storage=reviews.storage.ImportStorage(), upload_to='', verbose_name='Отчёт об отклонённых строках')),
+                ('log', models.TextField(blank=True, verbose_name='Вывод импорта')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Загрузка данных',
+                'verbose_name_plural': 'Загрузки данных',
+                'ordering': ('-uploaded_at',),
+            },
+        ),
+    ]
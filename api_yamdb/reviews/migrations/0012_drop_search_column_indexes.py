@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:56
+
+from django.db import migrations
+import reviews.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_import_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='name_search',
+            field=reviews.fields.CaseFoldedCharField(default='', editable=False, max_length=512, source='name', verbose_name='Название для поиска'),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='name_search',
+            field=reviews.fields.CaseFoldedCharField(default='', editable=False, max_length=512, source='name', verbose_name='Название для поиска'),
+        ),
+        migrations.AlterField(
+            model_name='title',
+            name='name_search',
+            field=reviews.fields.CaseFoldedCharField(default='', editable=False, max_length=512, source='name', verbose_name='Название для поиска'),
+        ),
+    ]
@@ -1,8 +1,17 @@
 import textwrap as tw
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import (Case, Count, F, OuterRef, Q, Subquery, Sum,
+                              Value, When)
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
 
+from reviews.fields import CaseFoldedCharField
+from reviews.search import search_titles
+from reviews.storage import ImportStorage
 from reviews.validators import year_validator, score_validator
 
 
@@ -14,6 +23,11 @@ class Genre(models.Model):
         max_length=256,
         verbose_name='Название жанра'
     )
+    name_search = CaseFoldedCharField(
+        source='name',
+        max_length=512,
+        verbose_name='Название для поиска'
+    )
     slug = models.SlugField(
         unique=True,
         verbose_name='Слаг жанра'
@@ -33,6 +47,11 @@ class Category(models.Model):
         max_length=256,
         verbose_name='Название категории'
     )
+    name_search = CaseFoldedCharField(
+        source='name',
+        max_length=512,
+        verbose_name='Название для поиска'
+    )
     slug = models.SlugField(
         max_length=50,
         unique=True,
@@ -48,11 +67,72 @@ class Category(models.Model):
         verbose_name_plural = 'Категории'
 
 
+class TitleQuerySet(models.QuerySet):
+
+    def search(self, value):
+        """Full-text search over name and description, best match first."""
+        return search_titles(self, value)
+
+    def update_rating(self, score_delta, count_delta, **fields):
+        """Shift stored score aggregates by the given deltas in one UPDATE."""
+        score_sum = F('score_sum') + score_delta
+        score_count = F('score_count') + count_delta
+        return self.update(
+            score_sum=score_sum,
+            score_count=score_count,
+            rating=score_sum / NullIf(score_count, 0),
+            modified=timezone.now(),
+            **fields
+        )
+
+    def recalculate_rating(self):
+        """
+        Rebuild stored score aggregates from reviews in one UPDATE.
+        Titles keep their modification time if aggregates are unchanged.
+        """
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        score_sum = Coalesce(
+            Subquery(reviews.annotate(value=Sum('score')).values('value')),
+            0
+        )
+        score_count = Coalesce(
+            Subquery(reviews.annotate(value=Count('pk')).values('value')),
+            0
+        )
+        # modified goes first: MySQL evaluates assignments left to right,
+        # so it compares stored values before they are replaced
+        return self.update(
+            modified=Case(
+                When(
+                    Q(score_sum=score_sum, score_count=score_count),
+                    then=F('modified')
+                ),
+                default=Value(
+                    timezone.now(), output_field=models.DateTimeField()
+                )
+            ),
+            score_sum=score_sum,
+            score_count=score_count,
+            rating=Subquery(
+                reviews.annotate(
+                    value=Sum('score') / Count('pk')
+                ).values('value')
+            )
+        )
+
+
 class Title(models.Model):
     name = models.CharField(
         max_length=256,
         verbose_name='Название произведения'
     )
+    name_search = CaseFoldedCharField(
+        source='name',
+        max_length=512,
+        verbose_name='Название для поиска'
+    )
     year = models.IntegerField(
         verbose_name='Год выпуска',
         validators=[year_validator]
@@ -74,10 +154,48 @@ class Title(models.Model):
         related_name='titles',
         verbose_name='Категория'
     )
+    rating = models.IntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Рейтинг'
+    )
+    score_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Сумма оценок'
+    )
+    score_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество оценок'
+    )
+    modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    reviews_modified = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата изменения отзывов'
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values to compute facet count deltas on save
+        instance._loaded_facet = (
+            instance.__dict__.get('category_id'),
+            instance.__dict__.get('year')
+        )
+        return instance
+
     class Meta:
         ordering = ['id']
         verbose_name = 'Произведение'
@@ -110,11 +228,17 @@ class Review(models.Model):
         db_index=True,
         verbose_name='Дата добавления',
     )
+    comments_modified = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата изменения комментариев'
+    )
 
     class Meta:
         ordering = ['id']
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        indexes = [models.Index(fields=['title', 'pub_date', 'id'])]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'title'], name='unique_review'
@@ -124,6 +248,15 @@ class Review(models.Model):
     def __str__(self):
         return tw.shorten(self.text, 15, placeholder='...')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember loaded values to compute rating deltas on save
+        instance._loaded_score = (
+            instance.__dict__.get('title_id'), instance.__dict__.get('score')
+        )
+        return instance
+
 
 class Comment(models.Model):
     author = models.ForeignKey(
@@ -152,6 +285,335 @@ class Comment(models.Model):
         ordering = ['id']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [models.Index(fields=['review', 'pub_date', 'id'])]
 
     def __str__(self):
         return tw.shorten(self.text, 15, placeholder='...')
+
+
+class FacetCount(models.Model):
+    """Pre-aggregated number of titles, maintained by signals."""
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name='Категория'
+    )
+    year = models.IntegerField(
+        verbose_name='Год выпуска'
+    )
+    titles_count = models.IntegerField(
+        default=0,
+        verbose_name='Количество произведений'
+    )
+
+    # fields identifying a cell, year goes last
+    cell_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def shift(cls, delta, **lookup):
+        """Add delta to the count of lookup cell, creating it if needed."""
+        counts = cls.objects.filter(**lookup)
+        if counts.update(titles_count=F('titles_count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(titles_count=delta, **lookup)
+        except IntegrityError:
+            counts.update(titles_count=F('titles_count') + delta)
+
+    @classmethod
+    def shift_cells(cls, deltas):
+        """
+        Add deltas to many cells at once, deltas map tuples of
+        cell_fields values to numbers.
+        """
+        counts = cls.objects.filter(year__in={cell[-1] for cell in deltas})
+        changed = []
+        for count in counts:
+            cell = tuple(getattr(count, field) for field in cls.cell_fields)
+            if cell in deltas:
+                count.titles_count = F('titles_count') + deltas.pop(cell)
+                changed.append(count)
+        cls.objects.bulk_update(changed, ['titles_count'], batch_size=500)
+        created = [
+            cls(titles_count=delta, **dict(zip(cls.cell_fields, cell)))
+            for cell, delta in deltas.items()
+        ]
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(created, batch_size=500)
+        except IntegrityError:
+            # cells were created concurrently, shift them one by one
+            for cell, delta in deltas.items():
+                cls.shift(delta, **dict(zip(cls.cell_fields, cell)))
+
+    @classmethod
+    def rebuild(cls, years=None):
+        """
+        Recount all cells, or cells of given years, from titles with one
+        GROUP BY query, which subclasses build in aggregate_titles().
+        """
+        counts = cls.objects.all()
+        if years is not None:
+            counts = counts.filter(year__in=years)
+        with transaction.atomic():
+            counts.delete()
+            cls.objects.bulk_create(
+                cls.aggregate_titles(years), batch_size=500
+            )
+
+
+class TitleFacet(FacetCount):
+    cell_fields = ('category_id', 'year')
+
+    class Meta:
+        verbose_name = 'Количество произведений'
+        verbose_name_plural = 'Количество произведений'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'year'], name='unique_title_facet'
+            )
+        ]
+
+    @classmethod
+    def aggregate_titles(cls, years=None):
+        titles = Title.objects.order_by()
+        if years is not None:
+            titles = titles.filter(year__in=years)
+        rows = titles.values('category', 'year').annotate(total=Count('pk'))
+        return [
+            cls(
+                category_id=row['category'],
+                year=row['year'],
+                titles_count=row['total']
+            )
+            for row in rows
+        ]
+
+
+class GenreFacet(FacetCount):
+    genre = models.ForeignKey(
+        Genre,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Жанр'
+    )
+
+    cell_fields = ('genre_id', 'category_id', 'year')
+
+    class Meta:
+        verbose_name = 'Количество произведений жанра'
+        verbose_name_plural = 'Количество произведений жанров'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['genre', 'category', 'year'],
+                name='unique_genre_facet'
+            )
+        ]
+
+    @classmethod
+    def aggregate_titles(cls, years=None):
+        links = Title.genre.through.objects.order_by()
+        if years is not None:
+            links = links.filter(title__year__in=years)
+        rows = links.values(
+            'genre', 'title__category', 'title__year'
+        ).annotate(total=Count('pk'))
+        return [
+            cls(
+                genre_id=row['genre'],
+                category_id=row['title__category'],
+                year=row['title__year'],
+                titles_count=row['total']
+            )
+            for row in rows
+        ]
+
+
+class ImportedFile(models.Model):
+    """Content hash of the last imported version of a data file."""
+    filename = models.CharField(
+        max_length=256,
+        unique=True,
+        verbose_name='Имя файла'
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        verbose_name='SHA-256 содержимого'
+    )
+    imported_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата импорта'
+    )
+
+    class Meta:
+        verbose_name = 'Импортированный файл'
+        verbose_name_plural = 'Импортированные файлы'
+
+    def __str__(self):
+        return self.filename
+
+
+class ImportCheckpoint(models.Model):
+    """Position in a data file after the last committed import batch."""
+    filename = models.CharField(
+        max_length=256,
+        unique=True,
+        verbose_name='Имя файла'
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        verbose_name='SHA-256 содержимого'
+    )
+    offset = models.BigIntegerField(
+        verbose_name='Смещение в байтах'
+    )
+    batches = models.PositiveIntegerField(
+        verbose_name='Записано пачек'
+    )
+    rows = models.BigIntegerField(
+        verbose_name='Записано строк'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата записи'
+    )
+
+    class Meta:
+        verbose_name = 'Точка продолжения импорта'
+        verbose_name_plural = 'Точки продолжения импорта'
+
+    def __str__(self):
+        return f'{self.filename}: {self.rows}'
+
+
+class ImportJob(models.Model):
+    """Data file uploaded in admin and imported in background."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершён'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    filename = models.CharField(
+        max_length=256,
+        verbose_name='Таблица'
+    )
+    file = models.FileField(
+        upload_to='uploads/',
+        storage=ImportStorage(),
+        verbose_name='Файл',
+        help_text='csv, ndjson или json, возможно сжатый gzip'
+    )
+    upsert = models.BooleanField(
+        default=False,
+        verbose_name='Обновлять существующие строки'
+    )
+    size = models.BigIntegerField(
+        default=0,
+        verbose_name='Размер файла в байтах'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    rows = models.BigIntegerField(
+        default=0,
+        verbose_name='Записано строк'
+    )
+    created = models.BigIntegerField(
+        default=0,
+        verbose_name='Добавлено строк'
+    )
+    updated = models.BigIntegerField(
+        default=0,
+        verbose_name='Обновлено строк'
+    )
+    rejected = models.BigIntegerField(
+        default=0,
+        verbose_name='Отклонено строк'
+    )
+    report = models.FileField(
+        blank=True,
+        storage=ImportStorage(),
+        verbose_name='Отчёт об отклонённых строках'
+    )
+    log = models.TextField(
+        blank=True,
+        verbose_name='Вывод импорта'
+    )
+    uploaded_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата загрузки'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения'
+    )
+    heartbeat_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Последний сигнал обработчика'
+    )
+
+    class Meta:
+        ordering = ('-uploaded_at',)
+        verbose_name = 'Загрузка данных'
+        verbose_name_plural = 'Загрузки данных'
+
+    def __str__(self):
+        return f'{self.filename}: {self.file.name}'
+
+    @staticmethod
+    def get_heartbeat_deadline():
+        """Active jobs without heartbeats since then have lost their worker."""
+        return timezone.now() - timedelta(
+            seconds=settings.IMPORT_JOB_HEARTBEAT_TIMEOUT
+        )
+
+    @property
+    def is_orphaned(self):
+        """
+        Job left pending or running by a worker which is gone, for
+        example because its process was restarted during the import.
+        """
+        return (
+            self.status in (self.PENDING, self.RUNNING)
+            and self.heartbeat_at < self.get_heartbeat_deadline()
+        )
+
+    @property
+    def is_active(self):
+        return (
+            self.status in (self.PENDING, self.RUNNING)
+            and not self.is_orphaned
+        )
+
+    def get_progress(self):
+        """
+        Return imported rows and percent of file bytes, read from the
+        checkpoint of the running import. Percent of gzipped files
+        is unknown, because checkpoints keep unpacked offsets.
+        """
+        if self.status != self.RUNNING:
+            return self.rows, 100 if self.status == self.DONE else None
+        checkpoint = ImportCheckpoint.objects.filter(
+            filename=self.filename
+        ).first()
+        if checkpoint is None:
+            return 0, 0
+        if self.file.name.endswith('.gz') or not self.size:
+            return checkpoint.rows, None
+        return checkpoint.rows, min(100, checkpoint.offset * 100 // self.size)
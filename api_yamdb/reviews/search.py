@@ -0,0 +1,122 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import Q
+
+SEARCH_CONFIG = 'simple'
+
+SQLITE_TITLE_SEARCH_TABLE = 'reviews_title_fts'
+
+SQLITE_TITLE_SEARCH_TRIGGERS = {
+    'reviews_title_fts_insert': """
+        CREATE TRIGGER IF NOT EXISTS reviews_title_fts_insert
+        AFTER INSERT ON reviews_title BEGIN
+            INSERT INTO reviews_title_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+    'reviews_title_fts_delete': """
+        CREATE TRIGGER IF NOT EXISTS reviews_title_fts_delete
+        AFTER DELETE ON reviews_title BEGIN
+            INSERT INTO reviews_title_fts(
+                reviews_title_fts, rowid, name, description
+            ) VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    'reviews_title_fts_update': """
+        CREATE TRIGGER IF NOT EXISTS reviews_title_fts_update
+        AFTER UPDATE OF name, description ON reviews_title BEGIN
+            INSERT INTO reviews_title_fts(
+                reviews_title_fts, rowid, name, description
+            ) VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO reviews_title_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+POSTGRESQL_TITLE_SEARCH_INDEX = f"""
+    CREATE INDEX IF NOT EXISTS reviews_title_search_idx ON reviews_title
+    USING GIN (to_tsvector(
+        '{SEARCH_CONFIG}'::regconfig,
+        COALESCE(name, '') || ' ' || COALESCE(description, '')
+    ))
+"""
+
+
+def install_title_search(using='default', **kwargs):
+    """
+    Create full-text index over title name and description.
+    Connected to post_migrate: SQLite drops triggers whenever
+    a migration remakes the titles table, so they are restored here.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRESQL_TITLE_SEARCH_INDEX)
+        if connection.vendor != 'sqlite':
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TITLE_SEARCH_TABLE} '
+            'USING fts5(name, description, '
+            "content='reviews_title', content_rowid='id')"
+        )
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing.issuperset(SQLITE_TITLE_SEARCH_TRIGGERS):
+            return
+        for sql in SQLITE_TITLE_SEARCH_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(
+            f'INSERT INTO {SQLITE_TITLE_SEARCH_TABLE}'
+            f"({SQLITE_TITLE_SEARCH_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def _fts5_query(value):
+    """Quote every word of value as FTS5 prefix query."""
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in value.split()
+    )
+
+
+def _tsquery(value):
+    """
+    Quote every word of value as PostgreSQL prefix lexeme, so words
+    match like in _fts5_query and not only as whole words.
+    """
+    return ' & '.join(
+        "'{}':*".format(word.replace('\\', '\\\\').replace("'", "''"))
+        for word in value.split()
+    )
+
+
+def search_titles(queryset, value):
+    """Filter titles by full-text query, ordering them by relevance."""
+    if not value.split():
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        return queryset.extra(
+            tables=[SQLITE_TITLE_SEARCH_TABLE],
+            where=[
+                f'{SQLITE_TITLE_SEARCH_TABLE}.rowid = reviews_title.id',
+                f'{SQLITE_TITLE_SEARCH_TABLE} MATCH %s',
+            ],
+            params=[_fts5_query(value)],
+            select={'search_rank': f'{SQLITE_TITLE_SEARCH_TABLE}.rank'},
+        ).order_by('search_rank', 'id')
+    if vendor == 'postgresql':
+        vector = SearchVector('name', 'description', config=SEARCH_CONFIG)
+        query = SearchQuery(
+            _tsquery(value), config=SEARCH_CONFIG, search_type='raw'
+        )
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=SearchRank(vector, query)
+        ).filter(search_vector=query).order_by('-search_rank', 'id')
+    return queryset.filter(
+        Q(name__icontains=value) | Q(description__icontains=value)
+    )
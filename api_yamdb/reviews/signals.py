@@ -0,0 +1,189 @@
+from collections import Counter
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from reviews.models import (Category, Comment, Genre, GenreFacet, Review,
+                            Title, TitleFacet)
+
+# sent with `title_ids` after stored ratings of those titles changed
+rating_changed = Signal()
+
+# sent with `instances` after they were inserted by bulk_create,
+# which does not send post_save and m2m_changed
+bulk_created = Signal()
+
+# sent with `instances` after they were changed by bulk_update,
+# the sender recounts ratings and facets itself
+bulk_updated = Signal()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, raw, **kwargs):
+    """Apply review score change to stored title rating."""
+    if raw:
+        return
+    titles = Title.objects.filter(pk=instance.title_id)
+    now = timezone.now()
+    changed = [instance.title_id]
+    if created:
+        titles.update_rating(instance.score, 1, reviews_modified=now)
+    else:
+        title_id, score = getattr(instance, '_loaded_score', (None, None))
+        if title_id is None or score is None:
+            # previous values unknown, rebuild rating from reviews
+            titles.recalculate_rating()
+            titles.update(reviews_modified=now)
+        elif title_id != instance.title_id:
+            Title.objects.filter(pk=title_id).update_rating(
+                -score, -1, reviews_modified=now
+            )
+            titles.update_rating(instance.score, 1, reviews_modified=now)
+            changed.append(title_id)
+        elif score != instance.score:
+            titles.update_rating(
+                instance.score - score, 0, reviews_modified=now
+            )
+        else:
+            titles.update(reviews_modified=now)
+            changed = []
+    if changed:
+        rating_changed.send(sender=Title, title_ids=changed)
+    instance._loaded_score = (instance.title_id, instance.score)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    """Remove deleted review score from stored title rating."""
+    Title.objects.filter(pk=instance.title_id).update_rating(
+        -instance.score, -1, reviews_modified=timezone.now()
+    )
+    rating_changed.send(sender=Title, title_ids=[instance.title_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_review_on_comment_change(sender, instance, **kwargs):
+    Review.objects.filter(pk=instance.review_id).update(
+        comments_modified=timezone.now()
+    )
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_title_on_genre_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        titles = Title.objects.filter(pk=instance.pk)
+    elif reverse and action in ('post_add', 'post_remove'):
+        titles = Title.objects.filter(pk__in=pk_set)
+    elif reverse and action == 'pre_clear':
+        titles = Title.objects.filter(genre=instance)
+    else:
+        return
+    titles.update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def touch_titles_on_genre_change(sender, instance, **kwargs):
+    """Nested genre data of titles changes on genre rename or removal."""
+    if not kwargs.get('created'):
+        Title.objects.filter(genre=instance).update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_titles_on_category_change(sender, instance, **kwargs):
+    """Nested category data of titles changes on rename or removal."""
+    if not kwargs.get('created'):
+        Title.objects.filter(category=instance).update(
+            modified=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Title)
+def update_facets_on_title_save(sender, instance, created, raw, **kwargs):
+    """Move title between facet count cells on category or year change."""
+    if raw:
+        return
+    current = (instance.category_id, instance.year)
+    previous = getattr(instance, '_loaded_facet', (None, None))
+    if created:
+        TitleFacet.shift(1, category_id=instance.category_id,
+                         year=instance.year)
+    elif previous[1] is None:
+        # previous values unknown, recount everything
+        TitleFacet.rebuild()
+        GenreFacet.rebuild()
+    elif previous != current:
+        category_id, year = previous
+        TitleFacet.shift(-1, category_id=category_id, year=year)
+        TitleFacet.shift(1, category_id=instance.category_id,
+                         year=instance.year)
+        for genre_id in instance.genre.values_list('pk', flat=True):
+            GenreFacet.shift(-1, genre_id=genre_id,
+                             category_id=category_id, year=year)
+            GenreFacet.shift(1, genre_id=genre_id,
+                             category_id=instance.category_id,
+                             year=instance.year)
+    instance._loaded_facet = current
+
+
+@receiver(pre_delete, sender=Title)
+def update_facets_on_title_delete(sender, instance, **kwargs):
+    TitleFacet.shift(-1, category_id=instance.category_id,
+                     year=instance.year)
+    for genre_id in instance.genre.values_list('pk', flat=True):
+        GenreFacet.shift(-1, genre_id=genre_id,
+                         category_id=instance.category_id, year=instance.year)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_facets_on_title_genre_change(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    related = instance.titles if reverse else instance.genre
+    if action == 'post_add':
+        delta, related_ids = 1, pk_set
+    elif action == 'pre_remove':
+        delta = -1
+        related_ids = related.filter(
+            pk__in=pk_set
+        ).values_list('pk', flat=True)
+    elif action == 'pre_clear':
+        delta, related_ids = -1, related.values_list('pk', flat=True)
+    else:
+        return
+    if reverse:
+        pairs = [
+            (title, instance.pk)
+            for title in Title.objects.filter(pk__in=list(related_ids))
+        ]
+    else:
+        pairs = [(instance, genre_id) for genre_id in related_ids]
+    for title, genre_id in pairs:
+        GenreFacet.shift(delta, genre_id=genre_id,
+                         category_id=title.category_id, year=title.year)
+
+
+@receiver(bulk_created, sender=Title)
+def update_facets_on_titles_bulk_create(sender, instances, **kwargs):
+    """Shift touched facet cells by their numbers of new titles."""
+    titles = {title.pk: (title.category_id, title.year) for title in instances}
+    title_cells = Counter(titles.values())
+    genre_cells = Counter(
+        (genre_id, *titles[title_id])
+        for title_id, genre_id in Title.genre.through.objects.filter(
+            title_id__in=list(titles)
+        ).values_list('title_id', 'genre_id')
+    )
+    TitleFacet.shift_cells(title_cells)
+    GenreFacet.shift_cells(genre_cells)
+
+
+@receiver(post_delete, sender=Category)
+def update_facets_on_category_delete(sender, instance, **kwargs):
+    """Titles of deleted category fall into facet cells without category."""
+    TitleFacet.rebuild()
+    GenreFacet.rebuild()
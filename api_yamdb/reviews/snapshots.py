@@ -0,0 +1,239 @@
+import ast
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from reviews.models import Review, Title
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+# header is padded to a fixed size, so appended rows only rewrite the
+# shape in place; 128 bytes keep data aligned for memory mapping
+NPY_HEADER_SIZE = 128
+
+BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
+# array typecode and numpy dtype of every column
+INT8 = ('b', '|i1')
+INT32 = ('i', f'{BYTE_ORDER}i4')
+INT64 = ('q', f'{BYTE_ORDER}i8')
+DATETIME = ('q', f'{BYTE_ORDER}M8[us]')
+
+REVIEW_COLUMNS = {
+    'id': INT64,
+    'title_id': INT32,
+    'author_id': INT32,
+    'score': INT8,
+    'pub_date': DATETIME,
+}
+
+TITLE_COLUMNS = {
+    'id': INT32,
+    'category_id': INT32,
+    'year': INT32,
+}
+
+TITLE_GENRE_COLUMNS = {
+    'title_id': INT32,
+    'genre_id': INT32,
+}
+
+# missing foreign keys, such as titles without category
+NULL_ID = -1
+
+META_FILE = 'snapshot.json'
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def npy_header(dtype, length):
+    header = repr({
+        'descr': dtype, 'fortran_order': False, 'shape': (length,)
+    })
+    size = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+    return (
+        NPY_MAGIC + struct.pack('<H', size)
+        + header.ljust(size - 1).encode('latin1') + b'\n'
+    )
+
+
+def read_npy_header(stream):
+    """Return dtype and length of a column written by NpyColumn."""
+    prefix = stream.read(NPY_HEADER_SIZE)
+    if not prefix.startswith(NPY_MAGIC):
+        raise ValueError(f'{stream.name} is not a .npy file')
+    header = ast.literal_eval(prefix[len(NPY_MAGIC) + 2:].decode('latin1'))
+    return header['descr'], header['shape'][0]
+
+
+class NpyColumn:
+    """
+    One-dimensional array in NumPy .npy format, which is loaded with
+    numpy.load(path, mmap_mode='r') without copying. Rows are appended
+    in place after the given length, overwriting rows left there by an
+    interrupted update.
+    """
+
+    def __init__(self, path, typecode, dtype):
+        self.path = Path(path)
+        self.typecode = typecode
+        self.dtype = dtype
+        self.itemsize = array(typecode).itemsize
+
+    def create(self):
+        with open(self.path, 'wb') as f:
+            f.write(npy_header(self.dtype, 0))
+
+    def length(self):
+        with open(self.path, 'rb') as f:
+            dtype, length = read_npy_header(f)
+        if dtype != self.dtype:
+            raise ValueError(f'{self.path} has dtype {dtype}')
+        return length
+
+    def append(self, values, length=None):
+        if length is None:
+            length = self.length()
+        with open(self.path, 'r+b') as f:
+            f.seek(NPY_HEADER_SIZE + length * self.itemsize)
+            f.truncate()
+            array(self.typecode, values).tofile(f)
+            f.seek(0)
+            f.write(npy_header(self.dtype, length + len(values)))
+
+
+def load_column(path):
+    """
+    Return memoryview of a column mapped from its file, for readers
+    without NumPy. Datetimes are microseconds since the epoch.
+    """
+    with open(path, 'rb') as f:
+        dtype, length = read_npy_header(f)
+        typecode = next(
+            typecode for typecode, column_dtype in (
+                INT8, INT32, INT64, DATETIME
+            ) if column_dtype == dtype
+        )
+        if not length:
+            return memoryview(array(typecode))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)[NPY_HEADER_SIZE:]
+    return view[:length * array(typecode).itemsize].cast(typecode)
+
+
+def to_microseconds(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def write_table(directory, prefix, columns, rows):
+    """
+    Write rows to one .npy file per column, every file is written under
+    a temporary name and replaces the old one when complete.
+    """
+    values = {name: array(typecode) for name, (typecode, _) in columns.items()}
+    for row in rows:
+        for column, value in zip(values.values(), row):
+            column.append(NULL_ID if value is None else value)
+    for name, (typecode, dtype) in columns.items():
+        path = directory / f'{prefix}_{name}.npy'
+        partial = path.with_name(f'{path.name}.partial')
+        column = NpyColumn(partial, typecode, dtype)
+        column.create()
+        column.append(values[name])
+        os.replace(partial, path)
+
+
+class ReviewSnapshot:
+    """
+    Columnar snapshot of reviews, titles and the title to genre mapping
+    in a directory of .npy files. Reviews are appended incrementally
+    after the last exported id, titles and genres are small and are
+    rewritten every time. snapshot.json holds the number of complete
+    review rows, columns may be longer after an interrupted update.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.columns = {
+            name: NpyColumn(
+                self.directory / f'reviews_{name}.npy', typecode, dtype
+            )
+            for name, (typecode, dtype) in REVIEW_COLUMNS.items()
+        }
+
+    def read_meta(self):
+        try:
+            with open(self.directory / META_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_meta(self, meta):
+        path = self.directory / META_FILE
+        partial = path.with_name(f'{path.name}.partial')
+        with open(partial, 'w') as f:
+            json.dump(meta, f)
+        os.replace(partial, path)
+
+    def is_stale(self, meta):
+        """
+        Return True if exported reviews were deleted since the last
+        update, which incremental updates can not catch.
+        """
+        return Review.objects.filter(
+            pk__lte=meta['last_id']
+        ).count() != meta['rows']
+
+    def update(self, full=False, chunk_size=100000):
+        """
+        Append reviews created since the last update, or rebuild all
+        files if full or stale, and return numbers of rows kept from the
+        previous snapshot and rows after the update.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta = self.read_meta()
+        if full or meta is None or self.is_stale(meta):
+            meta = {'rows': 0, 'last_id': 0}
+            for column in self.columns.values():
+                column.create()
+            self.write_meta(meta)
+        before = meta['rows']
+        reviews = Review.objects.filter(
+            pk__gt=meta['last_id']
+        ).order_by('pk').values_list(*self.columns).iterator(chunk_size)
+        chunk = []
+        for row in reviews:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                meta = self._append(meta, chunk)
+                chunk = []
+        if chunk:
+            meta = self._append(meta, chunk)
+        write_table(self.directory, 'titles', TITLE_COLUMNS,
+                    Title.objects.order_by('pk').values_list(*TITLE_COLUMNS))
+        write_table(
+            self.directory, 'title_genre', TITLE_GENRE_COLUMNS,
+            Title.genre.through.objects.order_by(
+                'title_id', 'genre_id'
+            ).values_list(*TITLE_GENRE_COLUMNS)
+        )
+        return before, meta['rows']
+
+    def _append(self, meta, rows):
+        for index, (name, column) in enumerate(self.columns.items()):
+            values = [row[index] for row in rows]
+            if name == 'pub_date':
+                values = [to_microseconds(value) for value in values]
+            column.append(values, meta['rows'])
+        meta = {'rows': meta['rows'] + len(rows), 'last_id': rows[-1][0]}
+        self.write_meta(meta)
+        return meta
@@ -0,0 +1,21 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ImportStorage(FileSystemStorage):
+    """
+    Storage of uploaded import files and reports in IMPORT_JOBS_DIR.
+    They are not served as media, reports are downloaded through admin.
+    """
+
+    @property
+    def base_location(self):
+        return settings.IMPORT_JOBS_DIR
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
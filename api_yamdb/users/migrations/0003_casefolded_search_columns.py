@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:19
+
+from django.db import migrations
+import reviews.fields
+
+
+def fill_username_search(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    users = list(CustomUser.objects.only('pk', 'username'))
+    for user in users:
+        user.username_search = reviews.fields.casefold(user.username)
+    CustomUser.objects.bulk_update(users, ['username_search'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20220209_1313'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='username_search',
+            field=reviews.fields.CaseFoldedCharField(db_index=True, default='', editable=False, max_length=300, source='username', verbose_name='Имя пользователя для поиска'),
+        ),
+        migrations.RunPython(fill_username_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:56
+
+from django.db import migrations
+import reviews.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_casefolded_search_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='username_search',
+            field=reviews.fields.CaseFoldedCharField(default='', editable=False, max_length=300, source='username', verbose_name='Имя пользователя для поиска'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from reviews.fields import CaseFoldedCharField
+
 
 class UserRole:
     USER = 'user'
@@ -27,6 +29,11 @@ class CustomUser(AbstractUser):
         max_length=150,
         unique=True
     )
+    username_search = CaseFoldedCharField(
+        source='username',
+        max_length=300,
+        verbose_name='Имя пользователя для поиска'
+    )
     first_name = models.CharField(
         max_length=150,
         blank=True
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    from api.autocomplete import autocomplete_indexes
+    from api.fuzzy import title_fuzzy_index
+    from api.leaderboards import title_leaderboards
+
+    def clear():
+        cache.clear()
+        for index in autocomplete_indexes.values():
+            index.reset()
+        title_fuzzy_index.reset()
+        title_leaderboards.reset()
+
+    clear()
+    yield
+    clear()
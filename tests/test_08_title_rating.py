@@ -0,0 +1,39 @@
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Title
+
+from .common import create_reviews
+
+
+class Test08TitleRating:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_on_review_delete(self, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        response = admin_client.delete(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[1]["id"]}/'
+        )
+        assert response.status_code == 204
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json().get('rating') == 4, (
+            'Проверьте, что после удаления отзыва `rating` пересчитывается'
+        )
+        for review in reviews:
+            admin_client.delete(
+                f'/api/v1/titles/{titles[0]["id"]}/reviews/{review["id"]}/'
+            )
+        response = admin_client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json().get('rating') is None, (
+            'Проверьте, что без отзывов `rating` равен `None`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_recalculate_ratings_command(self, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        Title.objects.update(rating=None, score_sum=0, score_count=0)
+        call_command('recalculate_ratings')
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.score_count, title.rating) == (12, 3, 4)
+        title = Title.objects.get(pk=titles[1]['id'])
+        assert (title.score_sum, title.score_count, title.rating) == (0, 0, None)
@@ -0,0 +1,54 @@
+from itertools import combinations
+
+import pytest
+
+from reviews.models import Category, Genre, Title
+
+from .common import create_titles
+
+TITLE_FILTERS = {
+    'category': 'films',
+    'genre': 'horror',
+    'name': 'Пово',
+    'year': 2000,
+}
+
+
+def create_many_titles(count):
+    category = Category.objects.get(slug='films')
+    genres = list(Genre.objects.filter(slug__in=('horror', 'comedy')))
+    for number in range(count):
+        title = Title.objects.create(
+            name=f'Поворот {number}', year=2000, category=category
+        )
+        title.genre.set(genres)
+
+
+class Test09TitleQueries:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('extra_titles', [0, 15])
+    def test_01_title_list_queries(self, client, admin_client,
+                                   django_assert_num_queries, extra_titles):
+        create_titles(admin_client)
+        create_many_titles(extra_titles)
+        for size in range(len(TITLE_FILTERS) + 1):
+            for keys in combinations(TITLE_FILTERS, size):
+                params = {key: TITLE_FILTERS[key] for key in keys}
+                # count (not cached yet), titles with categories, genres
+                with django_assert_num_queries(3):
+                    response = client.get('/api/v1/titles/', data=params)
+                assert response.status_code == 200
+                assert response.json()['results'], (
+                    f'Проверьте фильтрацию `/api/v1/titles/` по {params}'
+                )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_detail_queries(self, client, admin_client,
+                                     django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        # modification stamp, title with category, genres
+        with django_assert_num_queries(3):
+            response = client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.status_code == 200
+        assert len(response.json()['genre']) == 2
@@ -0,0 +1,52 @@
+import pytest
+
+from api.pagination import PubDateCursorPagination
+
+from .common import create_comments
+
+
+def collect_pages(client, url):
+    results = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, (
+            f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+        )
+        data = response.json()
+        assert 'count' not in data, (
+            'Проверьте, что в режиме курсора не возвращается параметр `count`'
+        )
+        results.extend(data['results'])
+        url = data['next']
+    return results
+
+
+class Test10CursorPagination:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_titles_cursor(self, client, admin_client, admin):
+        _, _, titles, _, _ = create_comments(admin_client, admin)
+        results = collect_pages(client, '/api/v1/titles/?cursor=')
+        assert [title['id'] for title in results] == [
+            title['id'] for title in titles
+        ]
+        results = collect_pages(client, '/api/v1/titles/?cursor=&year=2020')
+        assert [title['id'] for title in results] == [titles[1]['id']], (
+            'Проверьте, что режим курсора работает вместе с фильтрами'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reviews_and_comments_cursor(self, client, admin_client,
+                                            admin, monkeypatch):
+        monkeypatch.setattr(PubDateCursorPagination, 'page_size', 2)
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        results = collect_pages(client, f'{url}?cursor=')
+        assert [review['id'] for review in results] == [
+            review['id'] for review in reviews
+        ]
+        url = f'{url}{reviews[0]["id"]}/comments/'
+        results = collect_pages(client, f'{url}?cursor=')
+        assert [comment['id'] for comment in results] == [
+            comment['id'] for comment in comments
+        ]
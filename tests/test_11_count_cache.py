@@ -0,0 +1,65 @@
+import pytest
+
+from .common import create_titles
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path),
+    }}
+
+
+class Test11CountCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_count_cached(self, client, admin_client, shared_cache,
+                             django_assert_num_queries):
+        create_titles(admin_client)
+        response = client.get('/api/v1/titles/?genre=drama&page=1')
+        assert response.json()['count'] == 1
+        # titles with categories, genres
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/titles/?genre=drama')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что кэшированное значение `count` корректно'
+        )
+        assert 'count_estimated' not in response.json()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_count_invalidated(self, client, admin_client, shared_cache):
+        titles, _, genres = create_titles(admin_client)
+        url = '/api/v1/titles/?genre=drama'
+        assert client.get(url).json()['count'] == 1
+        data = {'name': 'Драма', 'year': 2001, 'genre': [genres[2]['slug']],
+                'category': 'films'}
+        admin_client.post('/api/v1/titles/', data=data)
+        assert client.get(url).json()['count'] == 2, (
+            'Проверьте, что `count` обновляется после добавления записи'
+        )
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/',
+            data={'genre': [genres[2]['slug']]}
+        )
+        assert client.get(url).json()['count'] == 3, (
+            'Проверьте, что `count` обновляется после изменения жанров'
+        )
+        admin_client.delete(f'/api/v1/genres/{genres[2]["slug"]}/')
+        assert client.get(url).json()['count'] == 0, (
+            'Проверьте, что `count` обновляется после удаления жанра'
+        )
+        assert client.get('/api/v1/genres/').json()['count'] == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_count_not_cached_in_local_memory(
+            self, client, admin_client, django_assert_num_queries):
+        create_titles(admin_client)
+        client.get('/api/v1/titles/?genre=drama&page=1')
+        # count, titles with categories, genres
+        with django_assert_num_queries(3):
+            response = client.get('/api/v1/titles/?genre=drama')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что `count` не кешируется в кеше памяти процесса: '
+            'другие процессы не узнают об изменении записей'
+        )
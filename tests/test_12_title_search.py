@@ -0,0 +1,176 @@
+import random
+import threading
+
+import pytest
+from django.db import connection
+
+from api.fuzzy import (EditDistance, TrigramIndex, max_distance,
+                       title_fuzzy_index)
+
+from .common import create_titles
+
+
+class Test12TitleSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?search=драма')
+        assert response.status_code == 200
+        data = response.json()
+        assert [title['id'] for title in data['results']] == [titles[1]['id']], (
+            'Проверьте, что параметр `search` ищет по описанию произведения'
+        )
+        response = client.get('/api/v1/titles/?search=повор')
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что параметр `search` ищет по началу слов без учёта регистра'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_search_ranking_and_sync(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/',
+            data={'description': 'Драма драма драма'}
+        )
+        response = client.get('/api/v1/titles/?search=драма')
+        assert [title['id'] for title in response.json()['results']] == [
+            titles[0]['id'], titles[1]['id']
+        ], 'Проверьте, что результаты `search` упорядочены по релевантности'
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        response = client.get('/api/v1/titles/?search=драма&genre=drama')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что параметр `search` работает вместе с фильтрами'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_title_fuzzy_name(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?name_fuzzy=поворот')
+        assert response.status_code == 200
+        assert response['X-Fuzzy-Search'] == 'building', (
+            'Проверьте, что пока индекс `name_fuzzy` строится, '
+            'заголовок `X-Fuzzy-Search` равен `building`'
+        )
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что пока индекс `name_fuzzy` строится, '
+            'название ищется по вхождению'
+        )
+        title_fuzzy_index.rebuild_thread.join(5)
+        response = client.get('/api/v1/titles/?name_fuzzy=паварот туда')
+        assert response['X-Fuzzy-Search'] == 'complete'
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что параметр `name_fuzzy` находит название с опечаткой'
+        )
+        response = client.get('/api/v1/titles/?name_fuzzy=ПРАЕКТ')
+        assert [title['id'] for title in response.json()['results']] == [titles[1]['id']]
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Дюна'})
+        response = client.get('/api/v1/titles/?name_fuzzy=праект')
+        assert response.json()['count'] == 0, (
+            'Проверьте, что индекс `name_fuzzy` обновляется при изменении произведений'
+        )
+        response = client.get('/api/v1/titles/?name_fuzzy=дюнна')
+        assert [title['id'] for title in response.json()['results']] == [titles[1]['id']]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_casefolded_search(self, client, admin_client, admin):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?name=пОВОРОТ')
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что фильтр `name` не зависит от регистра кириллицы'
+        )
+        response = client.get('/api/v1/genres/?search=ужа')
+        assert response.json()['results'] == [{'name': 'Ужасы', 'slug': 'horror'}], (
+            'Проверьте, что поиск жанров не зависит от регистра кириллицы'
+        )
+        response = client.get('/api/v1/categories/?search=КНИГ')
+        assert [category['slug'] for category in response.json()['results']] == ['books']
+        response = admin_client.get(f'/api/v1/users/?search={admin.username.upper()}')
+        assert [user['username'] for user in response.json()['results']] == [admin.username]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_fuzzy_index_truncated(self, client, admin_client, settings):
+        settings.FUZZY_SEARCH_MAX_ENTRIES = 3
+        create_titles(admin_client)
+        client.get('/api/v1/titles/?name_fuzzy=праект')
+        title_fuzzy_index.rebuild_thread.join(5)
+        for url in ('/api/v1/titles/', '/api/v1/titles/facets/'):
+            response = client.get(url, {'name_fuzzy': 'праект'})
+            assert response['X-Fuzzy-Search'] == 'truncated', (
+                'Проверьте, что заголовок `X-Fuzzy-Search` сообщает '
+                'об усечённом индексе `name_fuzzy`'
+            )
+        assert 'X-Fuzzy-Search' not in client.get('/api/v1/titles/')
+
+    def test_06_trigram_index(self):
+        random.seed(0)
+        words = ['поворот', 'туда', 'проект', 'дюна', 'аааааааа', 'дом', 'кот']
+        names = [
+            ' '.join(random.choices(words, k=random.randint(1, 3)))
+            for _ in range(200)
+        ]
+        index = TrigramIndex(10000)
+        index.load((pk, name, None) for pk, name in enumerate(names))
+        index.remove(0)
+        for query in ('паварот', 'тудаа', 'праект туда', 'ааааааа', 'дом', 'кит'):
+            tolerance = max_distance(query)
+            distance_to = EditDistance(query)
+            distances = {}
+            for pk, name in enumerate(names[1:], 1):
+                keys = {name, *name.split()}
+                distance = min(distance_to(key) for key in keys)
+                if distance <= tolerance:
+                    distances[pk] = distance
+            assert index.search(query, 1000) == sorted(
+                distances, key=lambda pk: (distances[pk], pk)
+            ), (
+                'Проверьте, что триграммный индекс находит те же названия, '
+                'что и полный перебор'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_fuzzy_fallback_not_cached(self, admin_client, monkeypatch):
+        titles, _, _ = create_titles(admin_client)
+        built = threading.Event()
+        build = title_fuzzy_index.build
+
+        def slow_build():
+            built.wait(5)
+            return build()
+
+        monkeypatch.setattr(title_fuzzy_index, 'build', slow_build)
+        url = '/api/v1/titles/?name_fuzzy=паварот туда'
+        response = admin_client.get(url)
+        assert response['X-Fuzzy-Search'] == 'building'
+        assert response.json()['count'] == 0
+        built.set()
+        title_fuzzy_index.rebuild_thread.join(5)
+        response = admin_client.get(url)
+        assert response['X-Fuzzy-Search'] == 'complete'
+        data = response.json()
+        assert data['count'] == 1 and [
+            title['id'] for title in data['results']
+        ] == [titles[0]['id']], (
+            'Проверьте, что число результатов, посчитанное без индекса '
+            '`name_fuzzy`, не кешируется для готового индекса'
+        )
+
+    @pytest.mark.skipif(
+        connection.vendor != 'postgresql',
+        reason='full-text search of PostgreSQL'
+    )
+    @pytest.mark.django_db(transaction=True)
+    def test_08_postgresql_prefix_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get('/api/v1/titles/?search=повор тУД')
+        assert [title['id'] for title in response.json()['results']] == [titles[0]['id']], (
+            'Проверьте, что на PostgreSQL параметр `search` ищет по началу '
+            'слов, как на SQLite'
+        )
+        response = client.get('/api/v1/titles/?search=драм')
+        assert [title['id'] for title in response.json()['results']] == [titles[1]['id']]
+        response = client.get("/api/v1/titles/?search=повор' \\")
+        assert response.status_code == 200, (
+            'Проверьте, что кавычки и обратная косая черта в `search` '
+            'не ломают запрос'
+        )
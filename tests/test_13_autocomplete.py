@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+
+from api.autocomplete import PrefixIndex, autocomplete_indexes
+from reviews.models import Genre
+
+from .common import create_titles
+
+
+class Test13Autocomplete:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_autocomplete(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        response = client.get('/api/v1/autocomplete/', data={'q': 'ПОВ'})
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/autocomplete/` возвращается статус 200'
+        )
+        data = response.json()
+        assert data['titles'] == [
+            {'id': titles[0]['id'], 'name': titles[0]['name'], 'year': 2000}
+        ]
+        assert data['genres'] == [] and data['categories'] == []
+        response = client.get('/api/v1/autocomplete/', data={'q': 'туда'})
+        assert [title['id'] for title in response.json()['titles']] == [titles[0]['id']], (
+            'Проверьте, что автодополнение работает по началу любого слова названия'
+        )
+        response = client.get('/api/v1/autocomplete/', data={'q': 'ко'})
+        assert response.json()['genres'] == [genres[1]]
+        response = client.get('/api/v1/autocomplete/')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_autocomplete_incremental(self, client, admin_client):
+        titles, _, genres = create_titles(admin_client)
+        client.get('/api/v1/autocomplete/', data={'q': 'д'})
+        admin_client.post('/api/v1/genres/', data={'name': 'Детектив', 'slug': 'detective'})
+        admin_client.delete(f'/api/v1/genres/{genres[2]["slug"]}/')
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Дюна'})
+        data = client.get('/api/v1/autocomplete/', data={'q': 'д'}).json()
+        assert data['genres'] == [{'name': 'Детектив', 'slug': 'detective'}], (
+            'Проверьте, что индекс автодополнения обновляется при изменении жанров'
+        )
+        assert [title['name'] for title in data['titles']] == ['Дюна'], (
+            'Проверьте, что индекс автодополнения обновляется при изменении произведений'
+        )
+        response = admin_client.get('/api/v1/autocomplete/stats/')
+        assert response.status_code == 200
+        assert response.json()['genres']['items'] == 3
+        assert response.json()['genres']['memory_bytes'] > 0
+        response = client.get('/api/v1/autocomplete/stats/')
+        assert response.status_code == 401
+
+    def test_03_bulk_load(self):
+        names = ['Поворот туда', 'Проект', 'Туда и обратно', 'Дюна']
+        loaded, added = PrefixIndex(100), PrefixIndex(100)
+        loaded.load((pk, name, {'name': name}) for pk, name in enumerate(names))
+        for pk, name in enumerate(names):
+            added.add(pk, name, {'name': name})
+        assert loaded.keys == added.keys == sorted(added.keys), (
+            'Проверьте, что индекс, заполненный целиком, совпадает '
+            'с индексом, заполненным по одному элементу'
+        )
+        assert loaded.stats() == added.stats()
+        added.remove(0)
+        assert added.search('туда', 10) == [{'name': 'Туда и обратно'}]
+        truncated = PrefixIndex(3)
+        truncated.load((pk, name, {}) for pk, name in enumerate(names))
+        assert truncated.stats()['truncated']
+        assert truncated.stats()['entries'] == 3
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_background_rebuild(self, client, admin_client, settings,
+                                   monkeypatch):
+        _, _, genres = create_titles(admin_client)
+        client.get('/api/v1/autocomplete/', data={'q': 'д'})
+        Genre.objects.filter(slug=genres[1]['slug']).update(name='Детская')
+        settings.AUTOCOMPLETE_REBUILD_INTERVAL = 0
+        index = autocomplete_indexes['genres']
+        build = index.build
+        built = threading.Event()
+        saved = threading.Event()
+
+        def slow_build():
+            result = build()
+            built.set()
+            saved.wait(5)
+            return result
+
+        monkeypatch.setattr(index, 'build', slow_build)
+        data = client.get('/api/v1/autocomplete/', data={'q': 'дет'}).json()
+        assert data['genres'] == [], (
+            'Проверьте, что устаревший индекс отвечает, пока строится новый'
+        )
+        assert built.wait(5)
+        admin_client.post(
+            '/api/v1/genres/', data={'name': 'Детектив', 'slug': 'detective'}
+        )
+        saved.set()
+        index.rebuild_thread.join(5)
+        settings.AUTOCOMPLETE_REBUILD_INTERVAL = 600
+        data = client.get('/api/v1/autocomplete/', data={'q': 'дет'}).json()
+        assert sorted(genre['slug'] for genre in data['genres']) == [
+            genres[1]['slug'], 'detective'
+        ], (
+            'Проверьте, что новый индекс подменяет старый вместе '
+            'с изменениями, сделанными во время построения'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_search_and_rebuild_errors(self, client, admin_client,
+                                          monkeypatch, caplog):
+        create_titles(admin_client)
+        index = autocomplete_indexes['genres']
+        client.get('/api/v1/autocomplete/', data={'q': 'д'})
+        found = []
+        with index.lock:
+            searcher = threading.Thread(
+                target=lambda: found.append(index.search('д', 10))
+            )
+            searcher.start()
+            searcher.join(0.2)
+            assert searcher.is_alive(), (
+                'Проверьте, что поиск не читает индекс, пока его меняют '
+                'сигналы'
+            )
+        searcher.join(5)
+        assert found and found[0]
+
+        def failing_build():
+            raise RuntimeError('База недоступна')
+
+        monkeypatch.setattr(index, 'build', failing_build)
+        index.rebuild()
+        assert 'Rebuild of Genre index failed' in caplog.text, (
+            'Проверьте, что ошибки перестроения индекса пишутся в лог'
+        )
+        assert index.search('д', 10) == found[0]
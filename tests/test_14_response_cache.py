@@ -0,0 +1,47 @@
+import pytest
+
+from .common import create_reviews
+
+
+class Test14ResponseCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_anonymous_titles_cached(self, client, admin_client, admin,
+                                        django_assert_num_queries):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        url = '/api/v1/titles/?genre=horror&year=2000'
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        with django_assert_num_queries(0):
+            cached = client.get('/api/v1/titles/?year=2000&genre=horror&name=')
+        assert cached['X-Cache'] == 'HIT', (
+            'Проверьте, что ответ `/api/v1/titles/` кэшируется для анонимных пользователей'
+        )
+        assert cached.json() == response.json()
+        response = admin_client.get(url)
+        assert 'X-Cache' not in response, (
+            'Проверьте, что ответы авторизованным пользователям не кэшируются'
+        )
+        response = admin_client.get('/api/v1/cache/stats/')
+        assert response.json()['titles'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_cache_invalidated(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = '/api/v1/titles/?genre=horror'
+        assert client.get(url).json()['results'][0]['rating'] == 4
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/',
+            data={'score': 8}
+        )
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['results'][0]['rating'] == 5, (
+            'Проверьте, что кэш `/api/v1/titles/` сбрасывается при изменении отзывов'
+        )
+        admin_client.patch('/api/v1/titles/{}/'.format(titles[0]['id']), data={'name': 'Новое'})
+        assert client.get(url).json()['results'][0]['name'] == 'Новое'
+        admin_client.delete('/api/v1/genres/horror/')
+        assert client.get(url).json()['count'] == 0, (
+            'Проверьте, что кэш `/api/v1/titles/` сбрасывается при удалении жанров'
+        )
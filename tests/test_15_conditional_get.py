@@ -0,0 +1,65 @@
+import pytest
+
+from .common import create_comments
+
+
+class Test15ConditionalGet:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_detail_not_modified(self, client, admin_client, admin,
+                                          django_assert_num_queries):
+        _, reviews, titles, _, _ = create_comments(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        response = client.get(url)
+        etag = response['ETag']
+        assert etag.startswith('"') and response['Last-Modified'], (
+            f'Проверьте, что при GET запросе `{url}` возвращаются заголовки `ETag` и `Last-Modified`'
+        )
+        assert 'public' in response['Cache-Control']
+        assert 'Authorization' in response['Vary']
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            f'Проверьте, что при GET запросе `{url}` с актуальным `If-None-Match` возвращается статус 304'
+        )
+        assert response['ETag'] == etag
+        assert 'private' in admin_client.get(url)['Cache-Control']
+        admin_client.patch(
+            f'{url}reviews/{reviews[1]["id"]}/', data={'score': 10}
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что `ETag` произведения меняется при изменении рейтинга'
+        )
+        assert response.json()['rating'] == 6
+        etag = response['ETag']
+        admin_client.delete('/api/v1/genres/horror/')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что `ETag` произведения меняется при удалении его жанра'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reviews_and_comments_not_modified(self, client, admin_client,
+                                                  admin):
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+        for url in (reviews_url, comments_url, f'{comments_url}{comments[0]["id"]}/'):
+            etag = client.get(url)['ETag']
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304, (
+                f'Проверьте, что при GET запросе `{url}` с актуальным `If-None-Match` возвращается статус 304'
+            )
+            assert client.get(f'{url}?page=1', HTTP_IF_NONE_MATCH=etag).status_code == 200
+        reviews_etag = client.get(reviews_url)['ETag']
+        comments_etag = client.get(comments_url)['ETag']
+        admin_client.patch(f'{comments_url}{comments[0]["id"]}/', data={'text': 'новый'})
+        assert client.get(comments_url, HTTP_IF_NONE_MATCH=comments_etag).status_code == 200, (
+            'Проверьте, что `ETag` списка комментариев меняется при изменении комментария'
+        )
+        assert client.get(reviews_url, HTTP_IF_NONE_MATCH=reviews_etag).status_code == 304
+        admin_client.patch(f'{reviews_url}{reviews[0]["id"]}/', data={'text': 'новый'})
+        assert client.get(reviews_url, HTTP_IF_NONE_MATCH=reviews_etag).status_code == 200, (
+            'Проверьте, что `ETag` списка отзывов меняется при изменении отзыва'
+        )
@@ -0,0 +1,74 @@
+import pytest
+from django.core.management import call_command
+
+from .common import create_titles
+
+
+def get_facets(client, query=''):
+    response = client.get(f'/api/v1/titles/facets/{query}')
+    assert response.status_code == 200, (
+        'Проверьте, что при GET запросе `/api/v1/titles/facets/` '
+        'возвращается статус 200'
+    )
+    return response.json()
+
+
+def as_dict(rows, key='slug'):
+    return {row[key]: row['count'] for row in rows}
+
+
+class Test16TitleFacets:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_facet_counts(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        data = get_facets(client)
+        assert data['count'] == 2
+        assert as_dict(data['genre']) == {
+            'horror': 1, 'comedy': 1, 'drama': 1
+        }, 'Проверьте подсчёт произведений по жанрам'
+        assert as_dict(data['category']) == {'films': 1, 'books': 1}
+        assert as_dict(data['year'], 'year') == {2000: 1, 2020: 1}
+        data = get_facets(client, '?category=films')
+        assert data['count'] == 1
+        assert as_dict(data['category']) == {'films': 1, 'books': 1}, (
+            'Проверьте, что фасет не учитывает собственный фильтр'
+        )
+        assert as_dict(data['genre']) == {'horror': 1, 'comedy': 1}
+        assert as_dict(data['year'], 'year') == {2000: 1}
+        data = get_facets(client, '?genre=drama&year=2020')
+        assert data['count'] == 1
+        assert as_dict(data['category']) == {'books': 1}
+        assert as_dict(data['genre']) == {'drama': 1}
+        data = get_facets(client, '?name=пово')
+        assert data['count'] == 1, (
+            'Проверьте, что фасеты учитывают фильтр по названию'
+        )
+        assert as_dict(data['genre']) == {'horror': 1, 'comedy': 1}
+        assert client.get('/api/v1/titles/facets/?year=abc').status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_facets_follow_changes(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/',
+            data={'year': 2020, 'genre': ['drama']}
+        )
+        data = get_facets(client)
+        assert as_dict(data['year'], 'year') == {2020: 2}, (
+            'Проверьте, что фасеты обновляются при изменении произведения'
+        )
+        assert as_dict(data['genre']) == {'drama': 2}
+        admin_client.delete('/api/v1/categories/books/')
+        data = get_facets(client)
+        assert as_dict(data['category']) == {'films': 1}, (
+            'Проверьте, что фасеты обновляются при удалении категории'
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        data = get_facets(client)
+        assert data['count'] == 1
+        assert as_dict(data['genre']) == {'drama': 1}
+        call_command('rebuild_facets')
+        assert get_facets(client) == data, (
+            'Проверьте, что пересчёт фасетов даёт те же значения'
+        )
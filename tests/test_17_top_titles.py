@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from api.leaderboards import title_leaderboards
+from reviews.models import Title
+
+from .common import auth_client, create_reviews
+
+
+def get_top(client, query=''):
+    response = client.get(f'/api/v1/titles/top/{query}')
+    assert response.status_code == 200, (
+        'Проверьте, что при GET запросе `/api/v1/titles/top/` '
+        'возвращается статус 200'
+    )
+    return [title['id'] for title in response.json()]
+
+
+class Test17TopTitles:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_top_titles(self, client, admin_client, admin,
+                           django_assert_num_queries):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        admin_client.post(
+            f'/api/v1/titles/{second}/reviews/', data={'text': 'a', 'score': 10}
+        )
+        assert get_top(client) == [second, first], (
+            'Проверьте, что произведения упорядочены по убыванию рейтинга'
+        )
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/titles/top/')
+        assert response.json()[0]['rating'] == 10
+        assert get_top(client, '?min_reviews=2') == [first], (
+            'Проверьте, что параметр `min_reviews` отсекает произведения '
+            'с малым количеством отзывов'
+        )
+        assert get_top(client, '?limit=1') == [second]
+        assert get_top(client, '?genre=horror') == [first]
+        assert get_top(client, '?category=books') == [second]
+        assert get_top(client, '?genre=drama&category=films') == []
+        assert client.get('/api/v1/titles/top/?limit=0').status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_top_titles_follow_changes(self, client, admin_client, admin):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        admin_client.post(
+            f'/api/v1/titles/{second}/reviews/', data={'text': 'a', 'score': 10}
+        )
+        assert get_top(client) == [second, first]
+        auth_client(user).post(
+            f'/api/v1/titles/{second}/reviews/', data={'text': 'b', 'score': 1}
+        )
+        assert get_top(client, '?min_reviews=2') == [second, first], (
+            'Проверьте, что рейтинг обновляется при добавлении отзыва'
+        )
+        admin_client.patch(
+            f'/api/v1/titles/{first}/reviews/{reviews[0]["id"]}/',
+            data={'score': 10}
+        )
+        assert get_top(client) == [first, second], (
+            'Проверьте, что рейтинг обновляется при изменении оценки, '
+            'а при равном рейтинге выше произведение с большим числом отзывов'
+        )
+        admin_client.patch(
+            f'/api/v1/titles/{second}/', data={'genre': ['horror']}
+        )
+        assert get_top(client, '?genre=horror') == [first, second], (
+            'Проверьте, что рейтинг учитывает изменение жанров произведения'
+        )
+        assert get_top(client, '?genre=drama') == []
+        admin_client.delete(f'/api/v1/titles/{second}/')
+        assert get_top(client) == [first]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_background_rebuild(self, client, admin_client, admin,
+                                   settings, monkeypatch):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        first, second = titles[0]['id'], titles[1]['id']
+        admin_client.post(
+            f'/api/v1/titles/{second}/reviews/', data={'text': 'a', 'score': 10}
+        )
+        assert get_top(client) == [second, first]
+        # changed without signals, only a rebuild picks it up
+        Title.objects.filter(pk=first).update(rating=10, score_count=5)
+        settings.LEADERBOARD_REBUILD_INTERVAL = 0
+        build = title_leaderboards.build
+        built = threading.Event()
+        deleted = threading.Event()
+
+        def slow_build():
+            result = build()
+            built.set()
+            deleted.wait(5)
+            return result
+
+        monkeypatch.setattr(title_leaderboards, 'build', slow_build)
+        assert get_top(client) == [second, first], (
+            'Проверьте, что устаревший рейтинг отвечает, пока строится новый'
+        )
+        assert built.wait(5)
+        admin_client.delete(f'/api/v1/titles/{second}/')
+        deleted.set()
+        title_leaderboards.rebuild_thread.join(5)
+        settings.LEADERBOARD_REBUILD_INTERVAL = 600
+        assert get_top(client) == [first], (
+            'Проверьте, что новый рейтинг подменяет старый вместе '
+            'с изменениями, сделанными во время построения'
+        )
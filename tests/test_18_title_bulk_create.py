@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from reviews.models import Title
+
+from .common import create_categories, create_genre
+
+URL = '/api/v1/titles/bulk/'
+
+
+def make_titles(count):
+    return [
+        {'name': f'Сборник {number}', 'year': 1990 + number,
+         'genre': ['horror', 'drama'], 'category': 'books',
+         'description': 'Рассказы'}
+        for number in range(count)
+    ]
+
+
+class Test18TitleBulkCreate:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_bulk_create(self, client, admin_client,
+                            django_assert_max_num_queries):
+        create_genre(admin_client)
+        create_categories(admin_client)
+        response = client.post(
+            URL, data=json.dumps(make_titles(1)),
+            content_type='application/json'
+        )
+        assert response.status_code == 401, (
+            f'Проверьте, что при POST запросе `{URL}` без токена '
+            'возвращается статус 401'
+        )
+        client.get('/api/v1/autocomplete/?q=сбор')
+        with django_assert_max_num_queries(20):
+            response = admin_client.post(
+                URL, data=make_titles(30), format='json'
+            )
+        assert response.status_code == 201, (
+            f'Проверьте, что при POST запросе `{URL}` администратором '
+            'возвращается статус 201'
+        )
+        data = response.json()
+        assert len(data) == 30
+        assert data[0]['name'] == 'Сборник 0'
+        assert {genre['slug'] for genre in data[0]['genre']} == {
+            'horror', 'drama'
+        }
+        assert data[0]['category']['slug'] == 'books'
+        response = client.get('/api/v1/titles/?genre=drama')
+        assert response.json()['count'] == 30, (
+            'Проверьте, что созданные произведения доступны в списке'
+        )
+        facets = client.get('/api/v1/titles/facets/?genre=horror').json()
+        assert facets['count'] == 30, (
+            'Проверьте, что фасеты учитывают созданные произведения'
+        )
+        response = client.get('/api/v1/titles/?search=сборник')
+        assert response.json()['count'] == 30
+        response = client.get('/api/v1/autocomplete/?q=сбор&limit=50')
+        assert len(response.json()['titles']) == 30, (
+            'Проверьте, что созданные произведения попадают в автодополнение'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_bulk_create_errors(self, admin_client):
+        create_genre(admin_client)
+        create_categories(admin_client)
+        titles = make_titles(3)
+        titles[1]['genre'] = ['drama', 'western']
+        titles[2]['year'] = 3000
+        titles[2]['category'] = 'songs'
+        response = admin_client.post(URL, data=titles, format='json')
+        assert response.status_code == 400, (
+            f'Проверьте, что при POST запросе `{URL}` с некорректными '
+            'данными возвращается статус 400'
+        )
+        errors = response.json()
+        assert len(errors) == 3 and errors[0] == {}, (
+            'Проверьте, что ошибки возвращаются для каждого произведения'
+        )
+        assert 'genre' in errors[1]
+        assert 'year' in errors[2]
+        response = admin_client.post(URL, data=make_titles(1) + [
+            {'name': 'Без жанра', 'year': 2000, 'genre': ['western'],
+             'category': 'songs'}
+        ], format='json')
+        errors = response.json()
+        assert errors[0] == {} and set(errors[1]) == {'genre', 'category'}
+        assert admin_client.get('/api/v1/titles/').json()['count'] == 0, (
+            'Проверьте, что при ошибках произведения не создаются'
+        )
+        response = admin_client.post(URL, data={'name': 'Один'}, format='json')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_bulk_create_without_returned_ids(self, client, admin_client,
+                                                 monkeypatch):
+        from django.db import connection
+
+        create_genre(admin_client)
+        create_categories(admin_client)
+        first = admin_client.post(URL, data=make_titles(2), format='json')
+        monkeypatch.setattr(connection, 'vendor', 'mysql')
+        response = admin_client.post(
+            URL, data=make_titles(5)[2:], format='json'
+        )
+        monkeypatch.undo()
+        assert response.status_code == 201
+        names = dict(Title.objects.exclude(
+            pk__in=[title['id'] for title in first.json()]
+        ).values_list('pk', 'name'))
+        assert {
+            title['id']: title['name'] for title in response.json()
+        } == names, (
+            'Проверьте, что на базах без возврата id из bulk_create '
+            'произведения получают свои id'
+        )
+        facets = client.get('/api/v1/titles/facets/?genre=horror').json()
+        assert facets['count'] == 5, (
+            'Проверьте, что фасеты учитывают произведения, созданные '
+            'по одному'
+        )
@@ -0,0 +1,471 @@
+import csv
+import gzip
+import io
+import json
+import shutil
+import threading
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import Avg, Count
+
+from reviews.importer import JsonArrayReader, NdjsonReader, ParseError
+from reviews.models import (Category, Comment, Genre, GenreFacet,
+                            ImportedFile, Review, Title, TitleFacet)
+
+DATA_DIR = Path(settings.BASE_DIR) / 'static' / 'data'
+
+
+def stored_ratings():
+    return dict(Title.objects.filter(
+        score_count__gt=0
+    ).values_list('pk', 'score_count'))
+
+
+def review_ratings():
+    return dict(Review.objects.order_by().values('title').annotate(
+        count=Count('pk')
+    ).values_list('title', 'count'))
+
+
+class Test19ImportCsv:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_import_csv(self, client, django_assert_max_num_queries):
+        out = StringIO()
+        with django_assert_max_num_queries(300):
+            call_command('import_csv', batch_size=10, stdout=out, stderr=out)
+        assert 'rows/s' in out.getvalue(), (
+            'Проверьте, что команда `import_csv` выводит скорость импорта'
+        )
+        assert Title.objects.count() == 32
+        assert Review.objects.count() > 0 and Comment.objects.count() > 0
+        title = Title.objects.filter(score_count__gt=0).first()
+        average = title.reviews.aggregate(average=Avg('score'))['average']
+        assert title.rating == int(average), (
+            'Проверьте, что после импорта рейтинги произведений пересчитаны'
+        )
+        facets = (
+            list(TitleFacet.objects.values_list('category', 'year',
+                                                'titles_count')),
+            list(GenreFacet.objects.values_list('genre', 'category', 'year',
+                                                'titles_count')),
+        )
+        TitleFacet.rebuild()
+        GenreFacet.rebuild()
+        assert facets == (
+            list(TitleFacet.objects.values_list('category', 'year',
+                                                'titles_count')),
+            list(GenreFacet.objects.values_list('genre', 'category', 'year',
+                                                'titles_count')),
+        ), 'Проверьте, что после импорта фасеты пересчитаны'
+        response = client.get('/api/v1/titles/?search=шоушенка')
+        assert response.json()['count'] == 1
+        out = StringIO()
+        call_command('import_csv', stdout=out, stderr=out)
+        assert 'Title: 0 rows (0 created, 0 updated), 32 rejected' in (
+            out.getvalue()
+        ), 'Проверьте, что повторно импортируемые строки отклоняются'
+        assert Title.objects.count() == 32
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_import_gzip_and_stdin(self, tmp_path, monkeypatch):
+        for csv_file in DATA_DIR.glob('*.csv'):
+            with open(csv_file, 'rb') as source, \
+                    gzip.open(tmp_path / f'{csv_file.name}.gz', 'wb') as gz:
+                shutil.copyfileobj(source, gz)
+        category = (tmp_path / 'category.csv.gz').read_bytes()
+        (tmp_path / 'category.csv.gz').unlink()
+        monkeypatch.setattr(
+            'sys.stdin', io.TextIOWrapper(io.BytesIO(category))
+        )
+        out = StringIO()
+        call_command('import_csv', 'category.csv=-', stdout=out, stderr=out)
+        assert Category.objects.count() == 3, (
+            'Проверьте, что команда `import_csv` читает файл из stdin'
+        )
+        assert 'Peak memory' in out.getvalue(), (
+            'Проверьте, что команда `import_csv` выводит пиковый '
+            'расход памяти'
+        )
+        call_command(
+            'import_csv', *(
+                f'{path.name[:-3]}' for path in tmp_path.glob('*.csv.gz')
+            ), data_dir=tmp_path, batch_size=3, stdout=out, stderr=out
+        )
+        assert Title.objects.count() == 32, (
+            'Проверьте, что команда `import_csv` читает сжатые gzip файлы'
+        )
+        assert Review.objects.count() == 72
+        with pytest.raises(CommandError):
+            call_command('import_csv', 'unknown.csv', stdout=out)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_upsert(self, tmp_path):
+        out = StringIO()
+        call_command('import_csv', stdout=out, stderr=out)
+        assert ImportedFile.objects.count() == 7, (
+            'Проверьте, что команда `import_csv` сохраняет хэши файлов'
+        )
+        out = StringIO()
+        call_command('import_csv', upsert=True, stdout=out, stderr=out)
+        assert out.getvalue().count('Skipping') == 7, (
+            'Проверьте, что в режиме `--upsert` неизменённые файлы '
+            'пропускаются'
+        )
+        for csv_file in DATA_DIR.glob('*.csv'):
+            shutil.copy(csv_file, tmp_path)
+        titles = tmp_path / 'titles.csv'
+        titles.write_text(titles.read_text().replace(
+            '1,Побег из Шоушенка,', '1,Побег из тюрьмы,'
+        ))
+        (tmp_path / 'genre.csv').write_text(
+            'name,slug\nДрамы,drama\nВестерн,western\n'
+        )
+        out = StringIO()
+        call_command('import_csv', upsert=True, data_dir=tmp_path,
+                     stdout=out, stderr=out)
+        assert '32 rows (0 created, 1 updated)' in out.getvalue(), (
+            'Проверьте, что в режиме `--upsert` обновляются только '
+            'изменённые строки'
+        )
+        title = Title.objects.get(pk=1)
+        assert title.name == 'Побег из тюрьмы'
+        assert title.name_search == 'побег из тюрьмы'
+        assert Genre.objects.get(slug='drama').name == 'Драмы', (
+            'Проверьте, что строки без id сопоставляются по slug'
+        )
+        assert Genre.objects.filter(slug='western').exists()
+        assert Title.objects.count() == 32
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_parallel_import(self):
+        from reviews.importer import get_dependencies
+        from reviews.management.commands._csv_data_relations import (
+            csv_data_relation
+        )
+
+        models = [csv_pair['model'] for csv_pair in csv_data_relation]
+        dependencies = get_dependencies(models)
+        assert dependencies[Category] == set()
+        assert dependencies[Title] == {Category}, (
+            'Проверьте, что зависимости таблиц строятся по внешним ключам'
+        )
+        assert dependencies[Comment] == {Review, models[4]}
+        out = StringIO()
+        call_command('import_csv', workers=3, batch_size=10,
+                     stdout=out, stderr=out)
+        assert Title.objects.count() == 32, (
+            'Проверьте, что команда `import_csv --workers` импортирует '
+            'все таблицы'
+        )
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert Title.objects.filter(score_count__gt=0).exists()
+        call_command('import_csv', workers=2, stdout=out, stderr=out)
+        assert Title.objects.count() == 32
+        assert Review.objects.count() == 72
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_resume(self, monkeypatch):
+        out = StringIO()
+        call_command('import_csv', 'category.csv', 'genre.csv', 'titles.csv',
+                     'users.csv', stdout=out, stderr=out)
+        bulk_create = Review.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 4:
+                raise RuntimeError('Процесс остановлен')
+            return bulk_create(objs, *args, **kwargs)
+
+        monkeypatch.setattr(Review.objects, 'bulk_create',
+                            failing_bulk_create)
+        with pytest.raises(RuntimeError):
+            call_command('import_csv', 'review.csv', batch_size=10,
+                         stdout=out, stderr=out)
+        monkeypatch.undo()
+        assert Review.objects.count() == 30, (
+            'Проверьте, что записанные пачки фиксируются по отдельности'
+        )
+        assert stored_ratings() == review_ratings(), (
+            'Проверьте, что после ошибки импорта рейтинги пересчитываются '
+            'по записанным пачкам'
+        )
+        # a killed process does not recount anything
+        Title.objects.update(score_sum=0, score_count=0, rating=None)
+        out = StringIO()
+        call_command('import_csv', 'review.csv', batch_size=10, resume=True,
+                     stdout=out, stderr=out)
+        assert 'Resuming "review.csv" after 30 rows' in out.getvalue(), (
+            'Проверьте, что команда `import_csv --resume` продолжает '
+            'импорт с последней записанной пачки'
+        )
+        assert Review.objects.count() == 72
+        assert stored_ratings() == review_ratings(), (
+            'Проверьте, что продолженный импорт пересчитывает рейтинги '
+            'всех произведений'
+        )
+        out = StringIO()
+        call_command('import_csv', 'review.csv', resume=True,
+                     stdout=out, stderr=out)
+        assert 'Skipping "review.csv"' in out.getvalue()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_validation(self, tmp_path):
+        out = StringIO()
+        call_command('import_csv', 'category.csv', 'genre.csv', 'titles.csv',
+                     'users.csv', stdout=out, stderr=out)
+        (tmp_path / 'titles.csv').write_text(
+            'id,name,year,category_id\n'
+            '100,Новое произведение,2000,1\n'
+            '101,Из будущего,3000,1\n'
+            '102,Без категории,2000,99\n'
+            f'103,{"Длинное название" * 20},2000,1\n'
+            '104,Не год,год,1\n'
+            '1,Повтор,2000,1\n'
+        )
+        (tmp_path / 'review.csv').write_text(
+            'id,title_id,text,author_id,score,pub_date\n'
+            '1,1,Хорошо,100,10,2020-01-01T00:00:00Z\n'
+            '2,1,Ещё раз,100,9,2020-01-01T00:00:00Z\n'
+            '3,1,Слишком,101,11,2020-01-01T00:00:00Z\n'
+            '4,2,Нет автора,999,5,2020-01-01T00:00:00Z\n'
+            '5,2,Хорошо,101,7,2020-01-01T00:00:00Z\n'
+        )
+        report = tmp_path / 'rejected.csv'
+        out = StringIO()
+        call_command('import_csv', 'titles.csv', 'review.csv',
+                     data_dir=tmp_path, batch_size=2, report=report,
+                     stdout=out, stderr=out)
+        assert 'Title: 1 rows (1 created, 0 updated), 5 rejected' in (
+            out.getvalue()
+        ), 'Проверьте, что команда `import_csv` отклоняет невалидные строки'
+        assert 'Review: 2 rows (2 created, 0 updated), 3 rejected' in (
+            out.getvalue()
+        )
+        assert Title.objects.count() == 33
+        assert list(
+            Review.objects.order_by('id').values_list('id', flat=True)
+        ) == [1, 5]
+        with open(report, encoding='utf-8') as f:
+            rejected = {
+                (row['file'], row['row']): row['errors']
+                for row in csv.DictReader(f)
+            }
+        assert set(rejected) == {
+            ('titles.csv', '2'), ('titles.csv', '3'), ('titles.csv', '4'),
+            ('titles.csv', '5'), ('titles.csv', '6'), ('review.csv', '2'),
+            ('review.csv', '3'), ('review.csv', '4'),
+        }, 'Проверьте, что отклонённые строки записываются в отчёт'
+        assert rejected[('titles.csv', '2')].startswith('year:')
+        assert rejected[('titles.csv', '3')].startswith('category_id:')
+        assert rejected[('titles.csv', '4')].startswith('name:')
+        assert rejected[('titles.csv', '6')].startswith('id:')
+        assert rejected[('review.csv', '2')].startswith('__all__:'), (
+            'Проверьте, что повторный отзыв автора на произведение '
+            'отклоняется'
+        )
+        assert rejected[('review.csv', '3')].startswith('score:')
+        assert rejected[('review.csv', '4')].startswith('author_id:')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_json_formats(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('reviews.importer.JSON_CHUNK_SIZE', 7)
+        tables = {}
+        for csv_file in DATA_DIR.glob('*.csv'):
+            with open(csv_file, encoding='utf-8') as f:
+                tables[csv_file.stem] = list(csv.DictReader(f))
+        for name in ('category', 'genre', 'users', 'comments'):
+            (tmp_path / f'{name}.ndjson').write_text(''.join(
+                json.dumps(row, ensure_ascii=False) + '\n'
+                for row in tables[name]
+            ), encoding='utf-8')
+        for row in tables['titles']:
+            row['id'] = int(row['id'])
+            row['year'] = int(row['year'])
+        (tmp_path / 'titles.json').write_text(
+            json.dumps(tables['titles'], ensure_ascii=False, indent=2),
+            encoding='utf-8'
+        )
+        with gzip.open(tmp_path / 'review.json.gz', 'wt',
+                       encoding='utf-8') as f:
+            json.dump(tables['review'], f, ensure_ascii=False)
+        out = StringIO()
+        call_command(
+            'import_csv', 'category', 'genre.csv', 'titles.json',
+            'users.ndjson', 'review', 'comments', data_dir=tmp_path,
+            batch_size=4, stdout=out, stderr=out
+        )
+        assert Title.objects.count() == 32, (
+            'Проверьте, что команда `import_csv` читает массивы json'
+        )
+        assert Title.objects.get(pk=1).name == 'Побег из Шоушенка'
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3, (
+            'Проверьте, что команда `import_csv` читает ndjson'
+        )
+        genre_title = ''.join(
+            json.dumps(row) + '\n' for row in tables['genre_title']
+        )
+        monkeypatch.setattr(
+            'sys.stdin', io.TextIOWrapper(io.BytesIO(genre_title.encode()))
+        )
+        call_command('import_csv', 'genre_title.csv=-', format='ndjson',
+                     stdout=out, stderr=out)
+        assert Title.genre.through.objects.count() == len(
+            tables['genre_title']
+        ), 'Проверьте, что формат stdin задаётся параметром `--format`'
+
+    def test_08_json_array_resume(self):
+        rows = [{'id': i, 'name': 'Ж' * i, 'year': 1.5e3} for i in range(20)]
+        data = json.dumps(rows, ensure_ascii=False).encode()
+        reader = JsonArrayReader(io.BytesIO(data))
+        head = [next(reader) for _ in range(7)]
+        reader = JsonArrayReader(io.BytesIO(data), reader.offset)
+        assert head + list(reader) == rows, (
+            'Проверьте, что чтение массива json продолжается со '
+            'смещения после последнего объекта'
+        )
+        with pytest.raises(ParseError):
+            list(JsonArrayReader(io.BytesIO(b'[{"id": 1} {"id": 2}]')))
+        with pytest.raises(ParseError):
+            list(NdjsonReader(io.BytesIO(b'{"id": 1}\n[1]\n')))
+        assert list(JsonArrayReader(io.BytesIO(b' [ ] '))) == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_09_upsert_recounts_changes(self, tmp_path):
+        out = StringIO()
+        call_command('import_csv', stdout=out, stderr=out)
+        modified = dict(Title.objects.values_list('pk', 'modified'))
+        users = tmp_path / 'users.csv'
+        users.write_text((DATA_DIR / 'users.csv').read_text().replace(
+            'bingobongo@yamdb.fake', 'bingo@yamdb.fake'
+        ))
+        call_command('import_csv', f'users.csv={users}', upsert=True,
+                     stdout=out, stderr=out)
+        assert dict(Title.objects.values_list('pk', 'modified')) == (
+            modified
+        ), (
+            'Проверьте, что импорт, не изменивший отзывы и произведения, '
+            'не меняет время изменения произведений'
+        )
+        review = Review.objects.filter(title_id=1).first()
+        reviews = tmp_path / 'review.ndjson'
+        reviews.write_text(json.dumps({
+            'id': review.pk, 'title_id': 1, 'score': 11 - review.score,
+        }) + '\n')
+        call_command('import_csv', f'review.csv={reviews}', upsert=True,
+                     stdout=out, stderr=out)
+        title = Title.objects.get(pk=1)
+        average = title.reviews.aggregate(average=Avg('score'))['average']
+        assert title.rating == int(average), (
+            'Проверьте, что рейтинг пересчитывается для произведений '
+            'изменённых отзывов'
+        )
+        changed = {
+            pk for pk, value in Title.objects.values_list('pk', 'modified')
+            if value != modified[pk]
+        }
+        assert changed == {1}, (
+            'Проверьте, что пересчёт рейтингов затрагивает только '
+            'произведения изменённых отзывов'
+        )
+        titles = tmp_path / 'titles.ndjson'
+        titles.write_text(json.dumps({'id': 2, 'year': 1999}) + '\n')
+        call_command('import_csv', f'titles.csv={titles}', upsert=True,
+                     stdout=out, stderr=out)
+        facets = (
+            sorted(TitleFacet.objects.values_list('category', 'year',
+                                                  'titles_count')),
+            sorted(GenreFacet.objects.values_list('genre', 'category', 'year',
+                                                  'titles_count')),
+        )
+        TitleFacet.rebuild()
+        GenreFacet.rebuild()
+        assert facets == (
+            sorted(TitleFacet.objects.values_list('category', 'year',
+                                                  'titles_count')),
+            sorted(GenreFacet.objects.values_list('genre', 'category', 'year',
+                                                  'titles_count')),
+        ), 'Проверьте, что фасеты пересчитываются для изменённых лет'
+        modified = dict(Title.objects.values_list('pk', 'modified'))
+        call_command('recalculate_ratings', stdout=out)
+        assert dict(Title.objects.values_list('pk', 'modified')) == (
+            modified
+        ), (
+            'Проверьте, что пересчёт рейтингов не меняет время изменения '
+            'произведений с прежним рейтингом'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_10_upsert_without_ids(self, client, tmp_path):
+        out = StringIO()
+        call_command('import_csv', 'genre.csv', stdout=out, stderr=out)
+        client.get('/api/v1/autocomplete/', data={'q': 'нуар'})
+        genres = tmp_path / 'genre.csv'
+        genres.write_text(
+            'name,slug\nНуар,noir\nНуар-комедия,noir-comedy\n'
+        )
+        call_command('import_csv', f'genre.csv={genres}', upsert=True,
+                     stdout=out, stderr=out)
+        response = client.get('/api/v1/autocomplete/', data={'q': 'нуар'})
+        assert response.json()['genres'] == [
+            {'name': 'Нуар', 'slug': 'noir'},
+            {'name': 'Нуар-комедия', 'slug': 'noir-comedy'},
+        ], (
+            'Проверьте, что строки без id попадают в индекс '
+            'автодополнения со своими id'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_11_parallel_import_two_workers(self):
+        out = StringIO()
+        importer = threading.Thread(
+            target=call_command, args=('import_csv',),
+            kwargs={'workers': 2, 'batch_size': 5, 'stdout': out,
+                    'stderr': out},
+            daemon=True
+        )
+        importer.start()
+        importer.join(60)
+        assert not importer.is_alive(), (
+            'Проверьте, что `import_csv --workers 2` не зависает, когда '
+            'задач разбора больше, чем процессов'
+        )
+        assert Title.objects.count() == 32
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+
+    @pytest.mark.django_db(transaction=True)
+    def test_12_comments_without_ids(self, tmp_path):
+        out = StringIO()
+        call_command('import_csv', 'category.csv', 'genre.csv', 'titles.csv',
+                     'genre_title.csv', 'users.csv', 'review.csv',
+                     stdout=out, stderr=out)
+        with open(DATA_DIR / 'comments.csv', encoding='utf-8') as source:
+            rows = list(csv.DictReader(source))
+        comments = tmp_path / 'comments.csv'
+        with open(comments, 'w', newline='', encoding='utf-8') as target:
+            writer = csv.DictWriter(
+                target, ['review_id', 'text', 'author_id', 'pub_date']
+            )
+            writer.writeheader()
+            for row in rows:
+                del row['id']
+                month = len(row['text']) % 9 + 1
+                row['pub_date'] = f'2019-0{month}-01T12:00:00Z'
+                writer.writerow(row)
+        call_command('import_csv', f'comments.csv={comments}', batch_size=2,
+                     stdout=out, stderr=out)
+        assert sorted(
+            (comment.text, comment.pub_date.date().isoformat())
+            for comment in Comment.objects.all()
+        ) == sorted((row['text'], row['pub_date'][:10]) for row in rows), (
+            'Проверьте, что даты комментариев из файла без id '
+            'сохраняются, а не заменяются текущим временем'
+        )
@@ -0,0 +1,172 @@
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+
+from reviews.import_jobs import import_jobs, run_import_job
+from reviews.models import Category, ImportJob, Title
+
+DATA_DIR = Path(settings.BASE_DIR) / 'static' / 'data'
+ADD_URL = '/admin/reviews/importjob/add/'
+
+
+class Test20AdminImport:
+
+    def upload(self, client, filename, name, content, upsert=False):
+        return client.post(ADD_URL, {
+            'filename': filename,
+            'file': SimpleUploadedFile(name, content),
+            'upsert': upsert,
+        })
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_upload(self, client, user_superuser, settings, tmp_path):
+        settings.IMPORT_JOBS_DIR = str(tmp_path)
+        client.force_login(user_superuser)
+        assert client.get(ADD_URL).status_code == 200
+        response = self.upload(
+            client, 'category.csv', 'category.csv',
+            (DATA_DIR / 'category.csv').read_bytes()
+        )
+        assert response.status_code == 302, (
+            'Проверьте, что файл для импорта загружается через админку'
+        )
+        import_jobs.join()
+        rows = [
+            {'id': 100, 'name': 'Новое', 'year': 2000, 'category_id': 1},
+            {'id': 101, 'name': 'Из будущего', 'year': 3000,
+             'category_id': 1},
+        ]
+        response = self.upload(
+            client, 'titles.csv', 'titles.ndjson',
+            ''.join(json.dumps(row) + '\n' for row in rows).encode()
+        )
+        assert response.status_code == 302
+        import_jobs.join()
+        assert Category.objects.count() == 3, (
+            'Проверьте, что загруженный файл импортируется в фоне'
+        )
+        assert list(Title.objects.values_list('pk', flat=True)) == [100]
+        job = ImportJob.objects.get(filename='titles.csv')
+        assert job.status == ImportJob.DONE
+        assert (job.created, job.rejected) == (1, 1)
+        assert job.get_progress() == (1, 100)
+        response = client.get('/admin/reviews/importjob/')
+        assert '100% (1 строк)' in response.content.decode(), (
+            'Проверьте, что прогресс загрузок показывается в админке'
+        )
+        response = client.get(f'/admin/reviews/importjob/{job.pk}/change/')
+        assert response.status_code == 200
+        assert 'http-equiv="refresh"' not in response.content.decode()
+        response = client.get(f'/admin/reviews/importjob/{job.pk}/report/')
+        assert response.status_code == 200
+        report = b''.join(response.streaming_content).decode()
+        assert 'titles.csv,2,year:' in report, (
+            'Проверьте, что отчёт об отклонённых строках скачивается '
+            'из админки'
+        )
+        response = self.upload(client, 'titles.csv', 'titles.txt', b'')
+        assert response.status_code == 200, (
+            'Проверьте, что файлы неподдерживаемых форматов не принимаются'
+        )
+        assert ImportJob.objects.count() == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_failed_job(self, client, user_superuser, settings, tmp_path,
+                           monkeypatch):
+        settings.IMPORT_JOBS_DIR = str(tmp_path)
+        monkeypatch.setattr(import_jobs, 'enqueue', lambda job_id: None)
+        client.force_login(user_superuser)
+        self.upload(client, 'genre.csv', 'genre.json', b'[{"id": 1} {}]')
+        job = ImportJob.objects.get()
+        assert job.status == ImportJob.PENDING
+        response = client.get(f'/admin/reviews/importjob/{job.pk}/change/')
+        assert 'http-equiv="refresh"' in response.content.decode(), (
+            'Проверьте, что страница незавершённой загрузки обновляется'
+        )
+        run_import_job(job.pk)
+        job.refresh_from_db()
+        assert job.status == ImportJob.FAILED, (
+            'Проверьте, что ошибка импорта сохраняется в загрузке'
+        )
+        assert 'is invalid' in job.log
+        assert job.finished_at is not None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_orphaned_job(self, client, user_superuser, settings,
+                             tmp_path, monkeypatch):
+        settings.IMPORT_JOBS_DIR = str(tmp_path)
+        queued = []
+        monkeypatch.setattr(import_jobs, 'enqueue', queued.append)
+        client.force_login(user_superuser)
+        self.upload(
+            client, 'category.csv', 'category.csv',
+            (DATA_DIR / 'category.csv').read_bytes()
+        )
+        alive, orphaned = ImportJob.objects.create(
+            filename='genre.csv', file='uploads/genre.csv',
+            status=ImportJob.RUNNING
+        ), ImportJob.objects.get(filename='category.csv')
+        # the worker of the job died with its process mid-import
+        ImportJob.objects.filter(pk=orphaned.pk).update(
+            status=ImportJob.RUNNING,
+            heartbeat_at=timezone.now() - timedelta(
+                seconds=settings.IMPORT_JOB_HEARTBEAT_TIMEOUT + 1
+            )
+        )
+        orphaned.refresh_from_db()
+        assert orphaned.is_orphaned and not orphaned.is_active
+        response = client.get(
+            f'/admin/reviews/importjob/{orphaned.pk}/change/'
+        )
+        content = response.content.decode()
+        assert 'http-equiv="refresh"' not in content, (
+            'Проверьте, что страница прерванной загрузки не обновляется'
+        )
+        assert 'Прервана' in content
+        queued.clear()
+        response = client.post('/admin/reviews/importjob/', {
+            'action': 'restart',
+            '_selected_action': [alive.pk, orphaned.pk],
+        })
+        assert response.status_code == 302
+        assert queued == [orphaned.pk], (
+            'Проверьте, что прерванные загрузки перезапускаются, '
+            'а выполняющиеся нет'
+        )
+        orphaned.refresh_from_db()
+        assert orphaned.status == ImportJob.PENDING
+        assert orphaned.is_active
+        monkeypatch.undo()
+        settings.IMPORT_JOBS_DIR = str(tmp_path)
+        run_import_job(orphaned.pk)
+        orphaned.refresh_from_db()
+        assert orphaned.status == ImportJob.DONE
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_heartbeat(self, monkeypatch):
+        job = ImportJob.objects.create(
+            filename='genre.csv', file='uploads/genre.csv',
+            heartbeat_at=timezone.now() - timedelta(days=1)
+        )
+        monkeypatch.setattr(
+            'reviews.import_jobs.run_import_job',
+            lambda job_id: time.sleep(0.5)
+        )
+        started = timezone.now()
+        import_jobs.enqueue(job.pk)
+        job.refresh_from_db()
+        assert job.heartbeat_at >= started
+        started = timezone.now()
+        import_jobs.touch()
+        job.refresh_from_db()
+        assert job.heartbeat_at >= started, (
+            'Проверьте, что обработчик отмечает выполняющиеся загрузки'
+        )
+        import_jobs.join()
+        assert not import_jobs.jobs
@@ -0,0 +1,65 @@
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from reviews.models import Comment, Review, Title
+from users.models import CustomUser
+
+
+class Test21ExportData:
+
+    def snapshot(self, tmp_path, name, **options):
+        call_command('export_data', output_dir=tmp_path / name,
+                     stdout=StringIO(), **options)
+        return {
+            path.name: path.read_bytes()
+            for path in sorted((tmp_path / name).iterdir())
+        }
+
+    def wipe(self):
+        for model in (Comment, Review, Title, CustomUser):
+            model.objects.all().delete()
+        call_command('flush', interactive=False)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_round_trip(self, tmp_path):
+        call_command('import_csv', stdout=StringIO(), stderr=StringIO())
+        pub_date = Review.objects.get(pk=1).pub_date
+        assert pub_date.year == 2019, (
+            'Проверьте, что импорт сохраняет даты публикации из файлов'
+        )
+        exported = self.snapshot(tmp_path, 'csv')
+        assert set(exported) == {
+            'category.csv', 'genre.csv', 'titles.csv', 'genre_title.csv',
+            'users.csv', 'review.csv', 'comments.csv'
+        }, 'Проверьте, что команда `export_data` выгружает все таблицы'
+        header = exported['titles.csv'].decode().splitlines()[0]
+        assert header == 'id,name,year,description,category_id', (
+            'Проверьте, что производные поля не выгружаются'
+        )
+        ndjson = self.snapshot(tmp_path, 'ndjson', format='ndjson',
+                               gzip=True, workers=2, chunk_size=7)
+        rows = [
+            json.loads(line) for line in gzip.decompress(
+                ndjson['review.ndjson.gz']
+            ).decode().splitlines()
+        ]
+        assert len(rows) == 72 and rows[0]['id'] == 1
+        assert rows[0]['pub_date'] == pub_date.isoformat()
+        self.wipe()
+        call_command('import_csv', data_dir=tmp_path / 'ndjson',
+                     stdout=StringIO(), stderr=StringIO())
+        assert self.snapshot(tmp_path, 'again') == exported, (
+            'Проверьте, что выгрузка `export_data` загружается обратно '
+            'командой `import_csv` без изменений'
+        )
+        self.wipe()
+        call_command('import_csv', data_dir=tmp_path / 'csv',
+                     stdout=StringIO(), stderr=StringIO())
+        assert self.snapshot(tmp_path, 'once_more') == exported
+        assert Title.objects.filter(score_count__gt=0).exists()
+        with pytest.raises(CommandError):
+            call_command('export_data', 'unknown', output_dir=tmp_path)
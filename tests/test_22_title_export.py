@@ -0,0 +1,55 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+URL = '/api/v1/titles/export/'
+
+
+def read_lines(response):
+    content = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class Test22TitleExport:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_export(self, client, user_client, admin_client, settings,
+                       django_assert_max_num_queries):
+        call_command('import_csv', stdout=StringIO(), stderr=StringIO())
+        assert client.get(URL).status_code == 401, (
+            'Проверьте, что выгрузка произведений недоступна анонимам'
+        )
+        assert user_client.get(URL).status_code == 403, (
+            'Проверьте, что выгрузка произведений доступна только '
+            'администратору'
+        )
+        settings.TITLES_EXPORT_CHUNK_SIZE = 10
+        with django_assert_max_num_queries(12):
+            response = admin_client.get(URL)
+            assert response.status_code == 200
+            assert response.streaming, (
+                'Проверьте, что выгрузка отдаётся потоком '
+                '(StreamingHttpResponse)'
+            )
+            assert response['Content-Type'].startswith(
+                'application/x-ndjson'
+            )
+            titles = read_lines(response)
+        assert [title['id'] for title in titles] == list(range(1, 33)), (
+            'Проверьте, что выгружаются все произведения по порядку'
+        )
+        detail = admin_client.get('/api/v1/titles/1/').json()
+        assert titles[0] == detail, (
+            'Проверьте, что произведение выгружается с жанрами, '
+            'категорией и рейтингом'
+        )
+        response = admin_client.get(f'{URL}?genre=drama&year=1994')
+        titles = read_lines(response)
+        assert titles and all(
+            title['year'] == 1994
+            and 'drama' in [genre['slug'] for genre in title['genre']]
+            for title in titles
+        ), 'Проверьте, что выгрузка принимает параметры фильтрации'
+        assert admin_client.get(f'{URL}?year=abc').status_code == 400
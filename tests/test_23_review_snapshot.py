@@ -0,0 +1,83 @@
+import ast
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Review, Title
+from reviews.snapshots import (NPY_HEADER_SIZE, NULL_ID, NpyColumn,
+                               from_microseconds, load_column)
+
+
+def snapshot(path, **options):
+    out = StringIO()
+    call_command('snapshot_reviews', output_dir=path, stdout=out, **options)
+    return out.getvalue()
+
+
+class Test23ReviewSnapshot:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_snapshot(self, tmp_path):
+        call_command('import_csv', stdout=StringIO(), stderr=StringIO())
+        assert 'Reviews: 72 rows, 72 added' in snapshot(tmp_path)
+        raw = (tmp_path / 'reviews_score.npy').read_bytes()
+        assert raw.startswith(b'\x93NUMPY\x01\x00'), (
+            'Проверьте, что столбцы записываются в формате .npy'
+        )
+        header = ast.literal_eval(raw[10:NPY_HEADER_SIZE].decode('latin1'))
+        assert header == {
+            'descr': '|i1', 'fortran_order': False, 'shape': (72,)
+        }
+        assert len(raw) == NPY_HEADER_SIZE + 72
+        reviews = list(Review.objects.order_by('pk').values_list(
+            'id', 'title_id', 'author_id', 'score', 'pub_date'
+        ))
+        columns = [
+            load_column(tmp_path / f'reviews_{name}.npy')
+            for name in ('id', 'title_id', 'author_id', 'score', 'pub_date')
+        ]
+        assert [
+            (*row[:4], from_microseconds(row[4])) for row in zip(*columns)
+        ] == reviews, 'Проверьте, что столбцы совпадают с отзывами'
+        titles = dict(zip(
+            load_column(tmp_path / 'titles_id.npy'),
+            load_column(tmp_path / 'titles_category_id.npy')
+        ))
+        assert len(titles) == 32
+        pairs = list(zip(
+            load_column(tmp_path / 'title_genre_title_id.npy'),
+            load_column(tmp_path / 'title_genre_genre_id.npy')
+        ))
+        assert sorted(pairs) == sorted(
+            Title.genre.through.objects.values_list('title_id', 'genre_id')
+        ), 'Проверьте, что записывается соответствие произведений и жанров'
+
+        Title.objects.filter(pk=1).update(category=None)
+        review = Review.objects.exclude(title_id=1).first()
+        Review.objects.create(
+            title_id=1, author_id=review.author_id, text='Новый', score=3
+        )
+        # rows left by an interrupted update are overwritten
+        NpyColumn(tmp_path / 'reviews_id.npy', 'q', '<i8').append([0, 0])
+        assert 'Reviews: 73 rows, 1 added' in snapshot(tmp_path), (
+            'Проверьте, что снимок дополняется отзывами после последнего id'
+        )
+        assert list(load_column(tmp_path / 'reviews_id.npy')) == list(
+            Review.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        titles = dict(zip(
+            load_column(tmp_path / 'titles_id.npy'),
+            load_column(tmp_path / 'titles_category_id.npy')
+        ))
+        assert titles[1] == NULL_ID
+        meta = json.loads((tmp_path / 'snapshot.json').read_text())
+        assert meta['rows'] == 73
+
+        Review.objects.filter(pk=1).delete()
+        assert 'Reviews: 72 rows, 72 added' in snapshot(tmp_path), (
+            'Проверьте, что снимок пересобирается после удаления отзывов'
+        )
+        assert 'Reviews: 72 rows, 0 added' in snapshot(tmp_path)
+        assert 'Reviews: 72 rows, 72 added' in snapshot(tmp_path, full=True)
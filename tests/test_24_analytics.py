@@ -0,0 +1,124 @@
+import math
+import time
+from array import array
+from collections import defaultdict
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Review, Title
+
+URL = '/api/v1/analytics/'
+
+
+def expected_groups():
+    """Score distributions computed row by row from the database."""
+    groups = defaultdict(list)
+    for review in Review.objects.select_related('title__category'):
+        title = review.title
+        groups['years', title.year].append(review.score)
+        if title.category is not None:
+            groups['categories', title.category.slug].append(review.score)
+        for genre in title.genre.all():
+            groups['genres', genre.slug].append(review.score)
+    expected = {}
+    for key, scores in groups.items():
+        scores.sort()
+        expected[key] = {
+            'count': len(scores),
+            'mean': round(sum(scores) / len(scores), 2),
+            'percentiles': [
+                scores[max(math.ceil(len(scores) * percentile / 100), 1) - 1]
+                for percentile in (25, 50, 75, 90)
+            ],
+            'histogram': [scores.count(score) for score in range(11)],
+        }
+    return expected
+
+
+def actual_groups(data):
+    return {
+        (name, group.get('slug', group.get('year'))): {
+            key: group[key]
+            for key in ('count', 'mean', 'percentiles', 'histogram')
+        }
+        for name in ('genres', 'categories', 'years')
+        for group in data[name]
+    }
+
+
+class Test24Analytics:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_analytics(self, client, user_client, admin_client):
+        call_command('import_csv', stdout=StringIO(), stderr=StringIO())
+        assert client.get(URL).status_code == 401, (
+            'Проверьте, что аналитика недоступна анонимам'
+        )
+        assert user_client.get(URL).status_code == 403, (
+            'Проверьте, что аналитика доступна только администратору'
+        )
+        response = admin_client.get(URL)
+        assert response.status_code == 200
+        data = response.json()
+        assert data['reviews'] == Review.objects.count()
+        assert data['percentiles'] == [25, 50, 75, 90]
+        assert actual_groups(data) == expected_groups(), (
+            'Проверьте, что гистограммы, средние и процентили оценок '
+            'считаются по жанрам, категориям и годам'
+        )
+
+        review = Review.objects.first()
+        Review.objects.filter(pk=review.pk).update(score=0)
+        assert admin_client.get(URL).json() == data, (
+            'Проверьте, что аналитика кешируется'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_refresh_interval(self, admin_client, settings):
+        call_command('import_csv', stdout=StringIO(), stderr=StringIO())
+        settings.ANALYTICS_REFRESH_INTERVAL = 0.5
+        data = admin_client.get(URL).json()
+        Title.objects.filter(pk=1).update(category=None)
+        Review.objects.filter(title_id=2).delete()
+        time.sleep(1)
+        refreshed = admin_client.get(URL).json()
+        assert refreshed['refreshed_at'] != data['refreshed_at'], (
+            'Проверьте, что аналитика пересчитывается по истечении '
+            'ANALYTICS_REFRESH_INTERVAL'
+        )
+        assert actual_groups(refreshed) == expected_groups()
+
+    def test_03_histograms(self):
+        from api import analytics
+        title_ids = array('i', [5, 3, 5, 9, 5, 3, 7])
+        scores = array('b', [10, 0, 10, 4, 2, 7, 1])
+        # titles 3, 5, 9; review of title 7 was created while reading
+        groups = [
+            ([(0, 0), (1, 0), (1, 1), (2, 1)], 2),
+            ([(0, 1), (2, 1)], 3),
+        ]
+        expected = [
+            [
+                [1, 0, 1, 0, 0, 0, 0, 1, 0, 0, 2],
+                [0, 0, 1, 0, 1, 0, 0, 0, 0, 0, 2],
+            ],
+            [
+                [0] * 11,
+                [1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0],
+                [0] * 11,
+            ],
+        ]
+        assert analytics.count_histograms(
+            [3, 5, 9], title_ids, scores, groups
+        ) == expected, (
+            'Проверьте, что гистограммы групп считаются по оценкам '
+            'произведений каждой группы'
+        )
+        assert analytics.summarize([1, 0, 1, 0, 0, 0, 0, 1, 0, 0, 2]) == {
+            'count': 5,
+            'mean': 5.8,
+            'percentiles': [2, 7, 10, 10],
+            'histogram': [1, 0, 1, 0, 0, 0, 0, 1, 0, 0, 2],
+        }